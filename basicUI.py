@@ -18,6 +18,21 @@ Functions:
             pos_type (str): The position type of the text element. Default is 'center'.
 
 Classes:
+    TextCache:
+        Represents an LRU-bounded cache of fonts and rendered text surfaces.
+
+        Methods:
+            __init__(max_fonts: int=16, max_surfaces: int=512) -> None:
+                Initializes a new TextCache object.
+            font(size: int) -> pygame.font.Font:
+                Returns the default font at the given size.
+            render(info_text: str, colour: tuple, size: int, antialias: bool=True) -> pygame.Surface:
+                Returns the rendered surface of a string.
+            stats() -> dict:
+                Returns the hit and miss counters.
+            clear() -> None:
+                Empties the cache and resets its counters.
+
     Button:
         Represents a clickable button element.
 
@@ -55,9 +70,95 @@ Private Classes:
 """
 
 import pygame
+from collections import OrderedDict
 from typing import Callable
 
-pygame.init()
+
+class TextCache:
+    """
+    Represents an LRU-bounded cache of fonts and rendered text surfaces.
+
+    Fonts are keyed by size and surfaces by (text, colour, size, antialias), so a label
+    drawn every frame is loaded and rasterized once. Returned surfaces are shared between
+    callers and must not be drawn on. The font module is initialized on the first font
+    miss, so importing basicUI does not initialize pygame.
+
+    Attributes:
+        max_fonts (int): The number of fonts kept before the least recently used is dropped.
+        max_surfaces (int): The number of surfaces kept before the least recently used is dropped.
+        font_hits (int): Font lookups served from the cache.
+        font_misses (int): Font lookups that loaded a font.
+        surface_hits (int): Render calls served from the cache.
+        surface_misses (int): Render calls that rasterized text.
+
+    Methods:
+        font(size: int) -> pygame.font.Font:
+            Returns the default font at the given size.
+        render(info_text: str, colour: tuple, size: int, antialias: bool=True) -> pygame.Surface:
+            Returns the rendered surface of a string.
+        stats() -> dict:
+            Returns the hit and miss counters.
+        clear() -> None:
+            Empties the cache and resets its counters.
+    """
+
+    def __init__(self, max_fonts: int=16, max_surfaces: int=512) -> None:
+
+        self.max_fonts = max_fonts
+        self.max_surfaces = max_surfaces
+        self._fonts = OrderedDict()
+        self._surfaces = OrderedDict()
+        self.clear()
+
+    def font(self, size: int) -> pygame.font.Font:
+
+        font = self._fonts.get(size)
+        if font is not None:
+            self.font_hits += 1
+            self._fonts.move_to_end(size)
+            return font
+
+        self.font_misses += 1
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.Font(None, size)
+        self._fonts[size] = font
+        if len(self._fonts) > self.max_fonts:
+            self._fonts.popitem(last=False)
+        return font
+
+    def render(self, info_text: str, colour: tuple, size: int, antialias: bool=True) -> pygame.Surface:
+
+        key = (info_text, tuple(colour), size, antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.surface_hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.surface_misses += 1
+        surface = self.font(size).render(info_text, antialias, colour)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_surfaces:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def stats(self) -> dict:
+
+        return {'font_hits': self.font_hits, 'font_misses': self.font_misses,
+                'surface_hits': self.surface_hits, 'surface_misses': self.surface_misses,
+                'fonts': len(self._fonts), 'surfaces': len(self._surfaces)}
+
+    def clear(self) -> None:
+
+        self._fonts.clear()
+        self._surfaces.clear()
+        self.font_hits = self.font_misses = 0
+        self.surface_hits = self.surface_misses = 0
+
+
+# shared by text(), Button and Dropdown
+text_cache = TextCache()
 
 
 def text(surface: pygame.Surface, info_text: str, pos: tuple,
@@ -75,8 +176,7 @@ def text(surface: pygame.Surface, info_text: str, pos: tuple,
             Options: 'center', 'topleft'.
     """
 
-    text_font = pygame.font.Font(None, size)
-    info = text_font.render(info_text, True, colour)
+    info = text_cache.render(info_text, colour, size)
     if pos_type == 'center':
         text_rect = info.get_rect(center=pos)
     elif pos_type == 'topleft':
@@ -131,10 +231,11 @@ class Slider:
                 value_percentage = (self.slider.centerx - self.bar.left) / self.bar.width
                 self.value = round(self.min_val + value_percentage * (self.max_val - self.min_val), 2)
 
-    def draw(self) -> None:
+    def draw(self, surface: pygame.Surface=None) -> None:
 
-        pygame.draw.rect(self.surface, self.bar_colour, self.bar, border_radius=3)
-        pygame.draw.ellipse(self.surface, self.slider_colour, self.slider)
+        surface = surface or self.surface
+        pygame.draw.rect(surface, self.bar_colour, self.bar, border_radius=3)
+        pygame.draw.ellipse(surface, self.slider_colour, self.slider)
 
 
 class Button:
@@ -169,8 +270,8 @@ class Button:
 
         self.text = button_text
         self.fontsize = fontsize
-        self.font = pygame.font.Font(None, self.fontsize)
-        self.info = self.font.render(self.text, True, self.fg)
+        self.font = text_cache.font(self.fontsize)
+        self.info = text_cache.render(self.text, self.fg, self.fontsize)
 
         self.info_rect = self.info.get_rect(topleft=self.pos)
         self.button_rect = self.info_rect.inflate(20, 20)
@@ -180,7 +281,7 @@ class Button:
     def change_text(self, new_text: str) -> None:
 
         self.text = new_text
-        self.info = self.font.render(self.text, True, self.fg)
+        self.info = text_cache.render(self.text, self.fg, self.fontsize)
 
     def update(self) -> None:
         """Method to check interactions with the button"""
@@ -254,16 +355,16 @@ class Dropdown:
 
         self.text = default_text
         self.fontsize = fontsize
-        self.font = pygame.font.Font(None, self.fontsize)
+        self.font = text_cache.font(self.fontsize)
         self.pad_x, self.pad_y = pad_x, pad_y
         self.border_width = 2
 
-        self.bar_text = self.font.render(self.text, True, self.fg)
+        self.bar_text = text_cache.render(self.text, self.fg, self.fontsize)
         self.bar_text_rect = self.bar_text.get_rect(topleft=self.pos)
         self.bar_box_rect = self.bar_text_rect.inflate(self.pad_x, self.pad_y)
         self.bar_text_rect.center = self.bar_box_rect.center
 
-        self.drop_text = self.font.render('v', True, self.fg)
+        self.drop_text = text_cache.render('v', self.fg, self.fontsize)
         self.drop_pos = (self.bar_box_rect.topright[0] + (self.pad_x // 2) - self.border_width,
                          self.bar_box_rect.topright[1] + (self.pad_y // 2))
         self.drop_text_rect = self.drop_text.get_rect(topleft=self.drop_pos)
@@ -280,12 +381,12 @@ class Dropdown:
         if len(self.options) == 1:
             text_pos = (self.bar_box_rect.bottomleft[0],
                         self.bar_box_rect.bottomleft[1] - self.border_width)
-            self.bar_text = self.font.render(option_text, True, self.fg)
+            self.bar_text = text_cache.render(option_text, self.fg, self.fontsize)
         else:
             text_pos = (self.option_boxes[-1].box_rect.bottomleft[0],
                         self.option_boxes[-1].box_rect.bottomleft[1] - self.border_width)
 
-        info = self.font.render(option_text, True, self.fg)
+        info = text_cache.render(option_text, self.fg, self.fontsize)
         info_text_rect = info.get_rect(topleft=(0, 0))
         info_box_rect = info_text_rect.inflate(self.pad_x, self.pad_y)
         info_box_rect.topleft = text_pos
@@ -306,10 +407,10 @@ class Dropdown:
             self.click_state = True
 
             if self.state is False:
-                self.drop_text = self.font.render("^", True, self.fg)
+                self.drop_text = text_cache.render("^", self.fg, self.fontsize)
                 self.state = True
             elif self.state is True:
-                self.drop_text = self.font.render("v", True, self.fg)
+                self.drop_text = text_cache.render("v", self.fg, self.fontsize)
                 self.state = False
 
         # resets the click state to False if the mouse is not pressed
@@ -337,7 +438,7 @@ class Dropdown:
                     self.click_state = True
                     box.command()
 
-                    self.drop_text = self.font.render("v", True, self.fg)
+                    self.drop_text = text_cache.render("v", self.fg, self.fontsize)
                     self.bar_text = box.text
                     self.state = False
 
@@ -0,0 +1,259 @@
+"""
+A module containing a headless benchmark suite for the physics, collision, rendering and UI hot paths.
+
+The suite runs under SDL's dummy video driver, so it needs no display and can run on a CI
+machine or over ssh before a new version goes to the display wall. Every case is timed
+`repeats` times for at least `min_time` seconds each and the median rate is reported, which
+keeps single-run noise out of the comparison.
+
+Results are written as JSON together with the versions and platform they were measured on.
+Passing a baseline compares every case against it and exits with status 1 if any case got
+slower by more than the tolerance, e.g.:
+
+    python benchmarks.py --save-baseline                # measure and store benchmark_baseline.json
+    python benchmarks.py --out results.json             # measure and compare with the stored baseline
+
+Functions:
+    measure(func: Callable, units: float=1.0, min_time: float=0.2, repeats: int=5) -> float:
+        Returns the median rate of units per second of calling func.
+    run_suite(quick: bool=False) -> dict:
+        Runs every benchmark case and returns the results.
+    compare(results: dict, baseline: dict, tolerance: float=0.2) -> list:
+        Returns the cases that regressed against a baseline.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from typing import Callable
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+import basicUI
+import collisions
+import forcing
+import kernels
+import physics
+from ensemble import Ensemble
+
+BASELINE_PATH = 'benchmark_baseline.json'
+
+
+def measure(func: Callable, units: float=1.0, min_time: float=0.2, repeats: int=5) -> float:
+    """
+    Returns the median rate of units per second of calling func.
+
+    Each repeat calls func in a loop until at least min_time seconds have passed, after one
+    untimed warm-up call that triggers any JIT compilation or cache filling.
+
+    Args:
+        func (Callable): The function to time, called with no arguments.
+        units (float): The amount of work done by one call, e.g. steps. Default is 1.0.
+        min_time (float): The minimum duration of one repeat in seconds. Default is 0.2.
+        repeats (int): The number of repeats. Default is 5.
+
+    Returns:
+        float: The median of the per-repeat rates.
+    """
+
+    func()
+    rates = []
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rates.append(calls * units / elapsed)
+    return float(np.median(rates))
+
+
+def _physics_cases(quick: bool) -> dict:
+
+    cases = {}
+    for n_links in (2, 10, 100):
+        chain = physics.Chain(np.linspace(0.1, 1.0, n_links), np.ones(n_links),
+                              np.full(n_links, 300 / n_links))
+        n_steps = max(1, 2000 // n_links)
+        cases[f'physics_{n_links}_links'] = ('steps/s', measure(
+            lambda chain=chain, n_steps=n_steps: chain.run(1e-4, n_steps), n_steps,
+            min_time=0.05 if quick else 0.2))
+    return cases
+
+
+def _ensemble_cases(quick: bool) -> dict:
+
+    n_systems = 10_000 if quick else 100_000
+    chain = physics.Chain(np.full(2, 0.3), np.ones(2), np.full(2, 100.0))
+    ensemble = Ensemble.from_chain(chain, n_systems, angle_spread=0.1, seed=0)
+    rate = measure(lambda: ensemble.run(1e-3, 5), n_systems * 5, min_time=0.05 if quick else 0.2)
+
+    # a 10 kHz pivot drive needs 10 us steps, sampled from the table before each run
+    ensemble.forcing = forcing.harmonic(0.1, 10_000)
+    driven = measure(lambda: ensemble.run(1e-5, 5), n_systems * 5, min_time=0.05 if quick else 0.2)
+    return {f'ensemble_{n_systems}_systems': ('pendulum-steps/s', rate),
+            f'ensemble_{n_systems}_systems_driven': ('pendulum-steps/s', driven)}
+
+
+def _collision_cases(quick: bool) -> dict:
+
+    min_time = 0.05 if quick else 0.2
+    cases = {}
+    for n_bobs in (100, 1_000, 10_000):
+        rng = np.random.default_rng(0)
+        # about 4 bobs per 100x100 px whatever the count, so the work per bob stays the same
+        points = rng.uniform(0, 50 * np.sqrt(n_bobs), (n_bobs, 2))
+        radii = rng.uniform(11, 20, n_bobs)
+        cases[f'collisions_{n_bobs}_bobs'] = ('bobs/s', measure(
+            lambda points=points, radii=radii: collisions.find_pairs(points, radii), n_bobs, min_time=min_time))
+
+    rng = np.random.default_rng(0)
+    side = 32
+    pivots = 150.0 * np.stack(np.divmod(np.arange(side * side), side), axis=-1)
+    scene = collisions.Scene(pivots, rng.uniform(0, 2 * np.pi, (side * side, 1)), np.full(1, 5.0),
+                             np.full(1, 100.0), rng.normal(0, 2, (side * side, 1)))
+    cases[f'scene_{side * side}_pendulums'] = ('pendulum-steps/s', measure(
+        lambda: scene.step(1e-3), side * side, min_time=min_time))
+    return cases
+
+
+def _ui_cases(quick: bool) -> dict:
+
+    surface = pygame.Surface((300, 600))
+    min_time = 0.05 if quick else 0.2
+    cases = {}
+
+    cases['text_cached'] = ('calls/s', measure(
+        lambda: basicUI.text(surface, "Mass 1:", (150, 100)), min_time=min_time))
+
+    # a new string every call misses the surface cache, like a changing counter would
+    counter = iter(range(10 ** 9))
+    cases['text_uncached'] = ('calls/s', measure(
+        lambda: basicUI.text(surface, f"t={next(counter)}", (150, 100)), min_time=min_time))
+
+    slider = basicUI.Slider(surface, (0, 0), 150, 40, min_val=1, max_val=40)
+    slider.set_center((150, 200))
+    cases['slider_draw'] = ('calls/s', measure(slider.draw, min_time=min_time))
+    return cases
+
+
+def _frame_cases(quick: bool) -> dict:
+
+    import pendulum_motion as app
+
+    app.setup()
+    min_time = 0.05 if quick else 0.2
+
+    def full_frame() -> None:
+        app.renderer.invalidate()
+        app.draw_surface()
+
+    def swinging_frame() -> None:
+        app.chain.step(app.physics_dt)
+        for ptc, angle in zip(app.particles, app.chain.angles):
+            ptc.angle = angle
+            ptc.update()
+        app.draw_surface()
+
+    return {'draw_surface_full': ('frames/s', measure(full_frame, min_time=min_time)),
+            'draw_surface_dirty': ('frames/s', measure(swinging_frame, min_time=min_time))}
+
+
+def run_suite(quick: bool=False) -> dict:
+    """
+    Runs every benchmark case.
+
+    Args:
+        quick (bool): Use smaller workloads and shorter repeats, for a fast smoke run. Default is False.
+
+    Returns:
+        dict: {'environment': {...}, 'results': {case: {'unit': str, 'value': float}}}, where
+            every value is a rate, so higher is better.
+    """
+
+    results = {}
+    for cases in (_physics_cases, _ensemble_cases, _collision_cases, _ui_cases, _frame_cases):
+        for name, (unit, value) in cases(quick).items():
+            results[name] = {'unit': unit, 'value': value}
+            print(f"{name:<28} {value:>16,.1f} {unit}")
+
+    environment = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pygame': pygame.version.ver,
+        'numba': kernels.HAVE_NUMBA,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'quick': quick,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    return {'environment': environment, 'results': results}
+
+
+def compare(results: dict, baseline: dict, tolerance: float=0.2) -> list:
+    """
+    Returns the cases that regressed against a baseline.
+
+    Args:
+        results (dict): The output of run_suite().
+        baseline (dict): An earlier output of run_suite().
+        tolerance (float): The allowed relative slowdown. Default is 0.2.
+
+    Returns:
+        list: (case, baseline value, new value, ratio) for every case slower than
+            (1 - tolerance) times its baseline. Cases missing from either side are ignored.
+    """
+
+    regressions = []
+    for name, entry in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]['value']
+        ratio = entry['value'] / old if old else float('inf')
+        print(f"{name:<28} x{ratio:.2f}")
+        if ratio < 1 - tolerance:
+            regressions.append((name, old, entry['value'], ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite.")
+    parser.add_argument('--out', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', default=BASELINE_PATH,
+                        help=f"baseline to compare against, default {BASELINE_PATH}")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slowdown, default 0.2")
+    parser.add_argument('--quick', action='store_true', help="smaller workloads for a fast smoke run")
+    args = parser.parse_args()
+
+    suite = run_suite(args.quick)
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(suite, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(suite, file, indent=2)
+        print(f"baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['environment'].get('quick') != args.quick:
+            print("warning: baseline and results use different workloads (--quick)")
+        print(f"\ncompared with {args.baseline}:")
+        regressions = compare(suite, baseline, args.tolerance)
+        for name, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: {old:,.1f} -> {new:,.1f} (x{ratio:.2f})")
+        sys.exit(1 if regressions else 0)
+    else:
+        print(f"no baseline at {args.baseline}, run with --save-baseline to store one")
@@ -0,0 +1,256 @@
+"""
+A module containing a generator for double pendulum "time to flip" chaos maps.
+
+Every pixel of the image is one double pendulum released from rest at an (angle1, angle2)
+pair, measured from hanging straight down, and is coloured by how long it takes either link
+to swing over the top. The two-link model and units are those of the pygame app.
+
+The map is evaluated in batches as Ensembles, with three ways of not wasting compute:
+
+    - Pixels whose energy is below the lowest energy at which either link can point
+      straight up can never flip, and are finished before any integration.
+    - Every check_every steps, pixels that have flipped are removed from the batch, so the
+      cost of a batch shrinks as its pixels finish.
+    - Pixels are split into interleaved chunks run in a process pool, so each worker gets
+      a mix of quick and slow pixels.
+
+Progressive refinement evaluates every 2^k-th pixel first and halves the stride each level,
+so a coarse preview of the whole image is available after a small fraction of the work.
+
+Functions:
+    flip_times(angle1: np.ndarray, angle2: np.ndarray, masses: tuple=(1, 1),
+               lengths: tuple=(100, 100), t_max: float=30.0, dt: float=2e-3,
+               check_every: int=25) -> np.ndarray:
+        Returns the first flip time of every initial angle pair.
+    chaos_map(size: tuple=(512, 512), levels: int=4, workers: int=None,
+              on_level: Callable=None, **kwargs) -> np.ndarray:
+        Computes a full chaos map with progressive refinement.
+    colourize(times: np.ndarray, t_max: float) -> np.ndarray:
+        Maps flip times to RGB colours.
+    write_png(path: str, rgb: np.ndarray, level: int=6) -> None:
+        Writes an (h, w, 3) uint8 image as a PNG file.
+"""
+
+import zlib
+import struct
+import argparse
+import multiprocessing
+from typing import Callable
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from physics import G
+from ensemble import Ensemble
+
+REST_ANGLE = np.pi / 2
+
+
+def _can_flip(angles: np.ndarray, masses: tuple, lengths: tuple, g: float) -> np.ndarray:
+    """
+    Returns whether each chain released from rest has enough energy to ever flip.
+
+    The cheapest way to get a link straight up is to have the other link hang straight
+    down, so a chain whose potential energy is below the lower of those two configurations
+    can never flip.
+    """
+
+    m0, m1 = masses
+    l0, l1 = lengths
+    mu0 = m0 + m1
+    energy = -g * (mu0 * l0 * np.sin(angles[:, 0]) + m1 * l1 * np.sin(angles[:, 1]))
+    first_up = g * (mu0 * l0 - m1 * l1)
+    second_up = g * (m1 * l1 - mu0 * l0)
+    return energy >= min(first_up, second_up)
+
+
+def flip_times(angle1: np.ndarray, angle2: np.ndarray, masses: tuple=(1, 1),
+               lengths: tuple=(100, 100), t_max: float=30.0, dt: float=2e-3,
+               check_every: int=25, g: float=G) -> np.ndarray:
+    """
+    Returns the first time either link of each double pendulum swings over the top.
+
+    Args:
+        angle1 (np.ndarray): Initial angles of the first link from hanging down.
+        angle2 (np.ndarray): Initial angles of the second link, same shape as angle1.
+        masses (tuple): The two bob masses. Default is (1, 1).
+        lengths (tuple): The two rod lengths in pixels. Default is (100, 100).
+        t_max (float): The time after which unflipped pendulums are given up on. Default is 30.0.
+        dt (float): The integration time step. Default is 2e-3.
+        check_every (int): The number of steps between flip checks. Default is 25.
+        g (float): Gravitational acceleration. Default is G.
+
+    Returns:
+        np.ndarray: Flip times with the shape of angle1, NaN where no flip happened by t_max.
+    """
+
+    shape = np.shape(angle1)
+    angles = REST_ANGLE + np.stack((np.ravel(angle1), np.ravel(angle2)), axis=-1).astype(float)
+    times = np.full(len(angles), np.nan)
+
+    active = np.flatnonzero(_can_flip(angles, masses, lengths, g))
+    if len(active) == 0:
+        return times.reshape(shape)
+
+    ensemble = Ensemble(angles[active], masses, lengths, g=g)
+    while len(active) and ensemble.t < t_max:
+        ensemble.run(dt, check_every)
+
+        flipped = np.any(np.abs(ensemble.angles - REST_ANGLE) > np.pi, axis=-1)
+        if flipped.any():
+            times[active[flipped]] = ensemble.t
+            keep = ~flipped
+            active = active[keep]
+            ensemble.angles = ensemble.angles[keep]
+            ensemble.angular_vels = ensemble.angular_vels[keep]
+            ensemble.masses = ensemble.masses[keep]
+            ensemble.lengths = ensemble.lengths[keep]
+
+    return times.reshape(shape)
+
+
+def _run_chunk(args: tuple) -> tuple:
+
+    pixels, angle1, angle2, kwargs = args
+    return pixels, flip_times(angle1, angle2, **kwargs)
+
+
+def chaos_map(size: tuple=(512, 512), levels: int=4, workers: int=None,
+              on_level: Callable=None, angle_range: tuple=(-np.pi, np.pi),
+              chunk_pixels: int=16384, **kwargs) -> np.ndarray:
+    """
+    Computes a chaos map with progressive refinement.
+
+    Level k evaluates the pixels on a grid of stride 2^(levels - 1 - k) that earlier levels
+    did not, so each level costs about three times the previous one and the first is
+    4^(levels - 1) times cheaper than the full image.
+
+    Args:
+        size (tuple): The (width, height) of the image. Default is (512, 512).
+        levels (int): The number of refinement levels. Default is 4.
+        workers (int): The number of worker processes, 0 to run in this process. Default is os.cpu_count().
+        on_level (Callable): Called as on_level(level, preview) after every level, where
+            preview is the full-size image with missing pixels filled from their nearest
+            computed neighbour. Default is None.
+        angle_range (tuple): The (min, max) initial angle on both axes. Default is (-pi, pi).
+        chunk_pixels (int): The number of pixels per worker task. Default is 16384.
+        **kwargs: Passed on to flip_times().
+
+    Returns:
+        np.ndarray: The (height, width) flip times, NaN where no flip happened.
+    """
+
+    width, height = size
+    angle1 = np.linspace(angle_range[0], angle_range[1], width)
+    angle2 = np.linspace(angle_range[1], angle_range[0], height)
+    times = np.full((height, width), np.nan)
+    done = np.zeros((height, width), dtype=bool)
+
+    pool = None
+    if workers != 0:
+        from kernels import single_threaded
+        # spawned, single-threaded workers, see sweep.run_sweep()
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=single_threaded)
+    try:
+        for level in range(levels):
+            stride = 2 ** (levels - 1 - level)
+            pending = np.zeros_like(done)
+            pending[::stride, ::stride] = True
+            pending &= ~done
+            rows, cols = np.nonzero(pending)
+            flat = rows * width + cols
+
+            n_chunks = max(1, -(-len(flat) // chunk_pixels))
+            tasks = [(flat[k::n_chunks], angle1[cols[k::n_chunks]], angle2[rows[k::n_chunks]], kwargs)
+                     for k in range(n_chunks)]
+            results = pool.map(_run_chunk, tasks) if pool else map(_run_chunk, tasks)
+            for pixels, chunk_times in results:
+                times.reshape(-1)[pixels] = chunk_times
+            done |= pending
+
+            if on_level:
+                ys = (np.arange(height) // stride) * stride
+                xs = (np.arange(width) // stride) * stride
+                on_level(level, times[ys[:, None], xs[None, :]])
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return times
+
+
+# colour stops from fast flips to slow ones
+_STOPS = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+_COLOURS = np.array([[255, 255, 200], [255, 200, 40], [230, 60, 40], [120, 20, 120], [20, 20, 80]])
+
+
+def colourize(times: np.ndarray, t_max: float) -> np.ndarray:
+    """
+    Maps flip times to colours on a log scale, with pixels that never flipped in black.
+
+    Args:
+        times (np.ndarray): Flip times, NaN for no flip.
+        t_max (float): The time that maps to the end of the colour scale.
+
+    Returns:
+        np.ndarray: uint8 RGB of shape times.shape + (3,).
+    """
+
+    flipped = ~np.isnan(times)
+    t_min = t_max / 1000
+    level = np.zeros(times.shape)
+    level[flipped] = np.log(np.clip(times[flipped], t_min, t_max) / t_min) / np.log(t_max / t_min)
+
+    rgb = np.zeros(times.shape + (3,), dtype=np.uint8)
+    for channel in range(3):
+        rgb[..., channel][flipped] = np.interp(level[flipped], _STOPS, _COLOURS[:, channel])
+    return rgb
+
+
+def write_png(path: str, rgb: np.ndarray, level: int=6) -> None:
+    """
+    Writes an (h, w, 3) uint8 image as an 8-bit RGB PNG using only zlib.
+
+    Args:
+        path (str): The file to write.
+        rgb (np.ndarray): The image.
+        level (int): The zlib compression level, 1 is fastest and 9 smallest. Default is 6.
+    """
+
+    height, width, _ = rgb.shape
+    # every scanline is prefixed by filter type 0 (none); zlib reads the array's buffer directly
+    raw = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    raw[:, 1:] = np.reshape(rgb, (height, -1))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b'IDAT', zlib.compress(raw, level)))
+        file.write(chunk(b'IEND', b''))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Render a double pendulum time-to-flip chaos map.")
+    parser.add_argument('out', help="output path prefix, writes OUT.png, OUT.npy and OUT_levelK.png previews")
+    parser.add_argument('--size', type=int, nargs=2, default=(512, 512), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--levels', type=int, default=4)
+    parser.add_argument('--t-max', type=float, default=30.0)
+    parser.add_argument('--dt', type=float, default=2e-3)
+    parser.add_argument('--masses', type=float, nargs=2, default=(1, 1))
+    parser.add_argument('--radii', type=float, nargs=2, default=(1, 1), help="rod lengths in slider units")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    def save_preview(level: int, preview: np.ndarray) -> None:
+        write_png(f"{args.out}_level{level}.png", colourize(preview, args.t_max))
+        print(f"level {level} written")
+
+    result = chaos_map(tuple(args.size), args.levels, args.workers, save_preview,
+                       masses=tuple(args.masses), lengths=tuple(100 * r for r in args.radii),
+                       t_max=args.t_max, dt=args.dt)
+    np.save(f"{args.out}.npy", result)
+    write_png(f"{args.out}.png", colourize(result, args.t_max))
@@ -0,0 +1,267 @@
+"""
+A module containing binary checkpointing and restore of the complete simulation state.
+
+A checkpoint is a single uncompressed .npz file holding the state arrays of a Chain or
+Ensemble bit for bit, plus one JSON header with everything else: the class, simulated time,
+integrator name and internals (tolerances, adaptive step size, evaluation count), backend,
+the pivot forcing table if there is one, the state of an optional NumPy random generator,
+and any caller state such as slider values.
+Python's JSON writes floats with repr(), so scalars round-trip exactly too, and a restored
+chain continues bit-identically to the one that was saved.
+
+Files are written to a temporary name, flushed to disk and renamed over the target, so a
+crash mid-write leaves the previous checkpoint intact. Checkpointer does the writing on a
+background thread: save() only copies the state arrays and encodes the header, which takes
+microseconds, and if a write is still running when the next save() arrives only the newest
+state is kept. State that cannot be encoded raises from save() itself, and a failed write
+is raised again from the next save(), wait() or close(), so a checkpoint that never reaches
+the disk does not go unnoticed.
+
+Functions:
+    capture(chain: Chain, rng: np.random.Generator=None, **extra) -> dict:
+        Returns a copy of the complete state of a chain.
+    write(path: str, state: dict) -> None:
+        Atomically writes a captured state to a file.
+    read(path: str) -> dict:
+        Reads a state written by write().
+    restore(state: dict) -> tuple:
+        Rebuilds (chain, rng, extra) from a captured or read state.
+    load(path: str) -> tuple:
+        Reads and restores a checkpoint file.
+
+Classes:
+    Checkpointer:
+        Represents a background writer of checkpoints to one path.
+
+        Methods:
+            __init__(path: str) -> None:
+                Initializes a new Checkpointer object and starts its writer thread.
+            save(chain: Chain, rng: np.random.Generator=None, **extra) -> None:
+                Captures the state now and writes it in the background.
+            wait() -> None:
+                Blocks until every pending checkpoint has been written.
+            close() -> None:
+                Writes any pending checkpoint and stops the writer thread.
+
+        Each of them first raises the error of a failed earlier write, if any.
+"""
+
+import os
+import json
+import threading
+import numpy as np
+
+from physics import Chain
+from forcing import ForcingTable
+
+VERSION = 1
+ARRAYS = ('angles', 'angular_vels', 'masses', 'lengths')
+
+
+def capture(chain: Chain, rng: np.random.Generator=None, **extra) -> dict:
+    """
+    Returns a copy of the complete state of a chain, safe to write while the chain moves on.
+
+    Args:
+        chain (Chain): The Chain or Ensemble to capture.
+        rng (np.random.Generator): A random generator whose state is saved too. Default is None.
+        **extra: JSON-serializable caller state, e.g. slider values.
+
+    Returns:
+        dict: {'arrays': {...}, 'header': {...}}.
+    """
+
+    header = {
+        'version': VERSION,
+        'class': type(chain).__name__,
+        'g': chain.g,
+        't': chain.t,
+        'method': chain.method,
+        'backend': chain.backend,
+        'rtol': chain.rtol,
+        'atol': chain.atol,
+        'adaptive_dt': chain.adaptive_dt,
+        'n_evals': chain.n_evals,
+        'rng': rng.bit_generator.state if rng is not None else None,
+        'forcing': None,
+        'extra': extra,
+    }
+    arrays = {name: np.array(getattr(chain, name), copy=True) for name in ARRAYS}
+
+    table = chain.forcing
+    if table is not None:
+        header['forcing'] = {'dt': table.dt, 't0': table.t0, 'periodic': table.periodic,
+                             'bias': table.bias.tolist()}
+        arrays['forcing_acc'] = table.acc.copy()
+        if table.displacement is not None:
+            arrays['forcing_displacement'] = table.displacement.copy()
+    return {'arrays': arrays, 'header': header}
+
+
+def _encode(state: dict) -> dict:
+    """Returns the arrays of a captured state with its header encoded as one more array."""
+
+    header = np.frombuffer(json.dumps(state['header']).encode(), dtype=np.uint8)
+    return dict(state['arrays'], header=header)
+
+
+def _write_arrays(path: str, arrays: dict) -> None:
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def write(path: str, state: dict) -> None:
+    """Atomically writes a captured state to path, replacing any previous checkpoint."""
+
+    _write_arrays(path, _encode(state))
+
+
+def read(path: str) -> dict:
+
+    with np.load(path) as data:
+        header = json.loads(data['header'].tobytes().decode())
+        if header['version'] != VERSION:
+            raise ValueError(f"{path} is a version {header['version']} checkpoint, expected {VERSION}")
+        return {'arrays': {name: data[name] for name in data.files if name != 'header'}, 'header': header}
+
+
+def restore(state: dict) -> tuple:
+    """
+    Rebuilds a chain from a captured or read state.
+
+    Returns:
+        tuple: (chain, rng, extra), where rng is None if no generator was captured.
+    """
+
+    header, arrays = state['header'], state['arrays']
+    if header['class'] == 'Ensemble':
+        from ensemble import Ensemble
+        cls = Ensemble
+    else:
+        cls = Chain
+
+    table = None
+    if header['forcing'] is not None:
+        options = header['forcing']
+        table = ForcingTable(arrays['forcing_acc'], options['dt'], options['t0'], options['periodic'],
+                             arrays.get('forcing_displacement'))
+        table.bias[:] = options['bias']
+
+    chain = cls(arrays['angles'], arrays['masses'], arrays['lengths'], arrays['angular_vels'],
+                g=header['g'], method=header['method'], backend=header['backend'], forcing=table)
+    chain.t = header['t']
+    chain.rtol, chain.atol = header['rtol'], header['atol']
+    chain.adaptive_dt = header['adaptive_dt']
+    chain.n_evals = header['n_evals']
+
+    rng = None
+    if header['rng'] is not None:
+        bit_generator = getattr(np.random, header['rng']['bit_generator'])()
+        bit_generator.state = header['rng']
+        rng = np.random.Generator(bit_generator)
+
+    return chain, rng, header['extra']
+
+
+def load(path: str) -> tuple:
+
+    return restore(read(path))
+
+
+class Checkpointer:
+    """
+    Represents a background writer of checkpoints to one path.
+
+    Attributes:
+        path (str): The checkpoint file.
+        n_written (int): The number of checkpoints written.
+        n_dropped (int): The number of states replaced by a newer one before being written.
+        error (Exception): The error of the last failed write, until it has been raised.
+    """
+
+    def __init__(self, path: str) -> None:
+
+        self.path = path
+        self.n_written = 0
+        self.n_dropped = 0
+        self.error = None
+
+        self._pending = None
+        self._writing = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+
+    def _raise_error(self) -> None:
+
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def save(self, chain: Chain, rng: np.random.Generator=None, **extra) -> None:
+        """
+        Captures the state of chain now and hands it to the writer thread.
+
+        Raises:
+            TypeError: If extra holds values JSON cannot encode, e.g. NumPy arrays.
+            Exception: The error of an earlier write that failed.
+        """
+
+        self._raise_error()
+        # encoding on the caller's thread makes bad extra state fail here, not in the writer
+        state = _encode(capture(chain, rng, **extra))
+        with self._condition:
+            if self._pending is not None:
+                self.n_dropped += 1
+            self._pending = state
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                state, self._pending = self._pending, None
+                self._writing = True
+
+            try:
+                _write_arrays(self.path, state)
+                self.n_written += 1
+            except Exception as error:
+                self.error = error
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def wait(self) -> None:
+
+        with self._condition:
+            while self._pending is not None or self._writing:
+                self._condition.wait()
+        self._raise_error()
+
+    def close(self) -> None:
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self) -> "Checkpointer":
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.close()
@@ -0,0 +1,308 @@
+"""
+A module containing bob collisions for scenes of many independent pendulums.
+
+Bobs are discs of radius mass + 10 pixels, the size the app draws them at. A Scene holds an
+Ensemble of chains, each hanging from its own pivot, and after every physics step finds the
+touching bobs and bounces them off each other.
+
+Detection uses a uniform grid whose cells are as wide as the largest bob, so two touching
+bobs are always in the same or neighbouring cells. Bobs are sorted by cell once, and every
+bob looks up its own cell and four of its eight neighbours (the other four find it) with a
+binary search, so finding the candidate pairs costs O(n log n) instead of comparing all
+n^2 / 2 pairs, and only candidates closer than their radii sum are kept.
+
+The response works in angle space, where the rods hold by construction. A bob's velocity is
+J w for the link angular velocities w, so an impulse of size lambda along the contact normal
+n changes w by M^-1 J^T n lambda, with M the chain's mass matrix: the whole chain reacts,
+the rods keep their length, and a bob pushed along its rod only moves the links above it.
+All contacts of a step are solved together with a few projected Jacobi iterations, each
+contact's share scaled down by the number of contacts on its chains, and the remaining
+overlap is pushed out along the same directions. Neighbouring bobs of one chain never
+collide, their rod already keeps them apart.
+
+Functions:
+    bob_radii(masses: np.ndarray) -> np.ndarray:
+        Returns the radius of every bob.
+    find_pairs(points: np.ndarray, radii: np.ndarray, cell_size: float=None) -> tuple:
+        Returns the index pairs of overlapping discs using a uniform grid.
+    brute_force_pairs(points: np.ndarray, radii: np.ndarray, block: int=1024) -> tuple:
+        Returns the index pairs of overlapping discs by testing every pair.
+    benchmark(n_bobs: int, n_steps: int=5, seed: int=0) -> dict:
+        Measures detection and scene step times for n_bobs single pendulums.
+
+Classes:
+    Scene:
+        Represents independent pendulums on their own pivots whose bobs collide.
+
+        Methods:
+            __init__(pivots, angles, masses, lengths, angular_vels=None, g: float=G,
+                     method: str='rk4', backend: str='auto', restitution: float=1.0,
+                     iterations: int=4) -> None:
+                Initializes a new Scene object.
+            positions() -> np.ndarray:
+                Returns the position of every bob.
+            collide() -> int:
+                Resolves the current contacts and returns their number.
+            step(dt: float) -> None:
+                Advances every chain by dt and resolves the contacts.
+            run(dt: float, n_steps: int) -> None:
+                Advances the scene by n_steps time steps.
+            energy() -> float:
+                Returns the total energy of the scene.
+"""
+
+import time
+import numpy as np
+
+from physics import G, mass_matrix, positions
+from ensemble import Ensemble
+
+BOB_PADDING = 10
+
+# the cell itself and half of its neighbours, as (dx, dy); the other half find us
+_HALF_NEIGHBOURHOOD = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def bob_radii(masses: np.ndarray) -> np.ndarray:
+    """Returns the radius of every bob, mass + 10 pixels as Particle.draw_particle draws it."""
+
+    return np.asarray(masses, dtype=float) + BOB_PADDING
+
+
+def _expand(first: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> tuple:
+    """Returns (first[k], m) for every k and every m in [starts[k], stops[k])."""
+
+    counts = np.maximum(stops - starts, 0)
+    total = int(counts.sum())
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(first, counts), np.repeat(starts, counts) + np.arange(total) - offsets
+
+
+def find_pairs(points: np.ndarray, radii: np.ndarray, cell_size: float=None) -> tuple:
+    """
+    Returns the index pairs of overlapping discs, using a uniform grid broad phase.
+
+    Args:
+        points (np.ndarray): (n, 2) disc centres.
+        radii (np.ndarray): (n,) disc radii.
+        cell_size (float): The grid spacing, at least the largest diameter. Default is None,
+            which uses the largest diameter.
+
+    Returns:
+        tuple: (i, j) index arrays with i != j, each overlapping pair listed once.
+    """
+
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    radii = np.asarray(radii, dtype=float).ravel()
+    if len(points) < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    if cell_size is None:
+        cell_size = 2 * radii.max()
+
+    cells = np.floor(points / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    # one spare row above and below, so a neighbour offset never wraps into the next column
+    rows = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * rows + cells[:, 1]
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    ranks = np.arange(len(points))
+
+    first, second = [], []
+    for dx, dy in _HALF_NEIGHBOURHOOD:
+        target = sorted_keys + dx * rows + dy
+        starts = np.searchsorted(sorted_keys, target, 'left')
+        stops = np.searchsorted(sorted_keys, target, 'right')
+        if dx == dy == 0:
+            # within a cell, every pair is only taken from its first member
+            starts = np.maximum(starts, ranks + 1)
+        a, b = _expand(ranks, starts, stops)
+        first.append(a)
+        second.append(b)
+
+    i, j = order[np.concatenate(first)], order[np.concatenate(second)]
+    delta = points[j] - points[i]
+    touching = np.einsum('ij,ij->i', delta, delta) < (radii[i] + radii[j]) ** 2
+    return i[touching], j[touching]
+
+
+def brute_force_pairs(points: np.ndarray, radii: np.ndarray, block: int=1024) -> tuple:
+    """Returns the same pairs as find_pairs() by testing all of them, a block of rows at a time."""
+
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    radii = np.asarray(radii, dtype=float).ravel()
+    first, second = [], []
+    for start in range(0, len(points), block):
+        rows = slice(start, start + block)
+        delta = points[None, :] - points[rows, None]
+        touching = np.einsum('ijk,ijk->ij', delta, delta) < (radii[rows, None] + radii[None, :]) ** 2
+        i, j = np.nonzero(touching)
+        i += start
+        keep = j > i
+        first.append(i[keep])
+        second.append(j[keep])
+    return np.concatenate(first), np.concatenate(second)
+
+
+class Scene:
+    """
+    Represents independent pendulums on their own pivots whose bobs collide.
+
+    Attributes:
+        ensemble (Ensemble): The chains, one system per pendulum.
+        pivots (np.ndarray): The (n_systems, 2) pivot of every chain.
+        restitution (float): The ratio of separating to approaching normal speed, 1 for
+            elastic bounces.
+        iterations (int): The number of Jacobi iterations per step.
+        n_contacts (int): The number of contacts resolved by the last step.
+    """
+
+    def __init__(self, pivots, angles, masses, lengths, angular_vels=None, g: float=G,
+                 method: str='rk4', backend: str='auto', restitution: float=1.0,
+                 iterations: int=4) -> None:
+
+        self.ensemble = Ensemble(angles, masses, lengths, angular_vels, g, method, backend)
+        self.pivots = np.array(pivots, dtype=float).reshape(-1, 2)
+        if len(self.pivots) != self.ensemble.n_systems:
+            raise ValueError("pivots must have one (x, y) row per chain")
+        self.restitution = restitution
+        self.iterations = iterations
+        self.n_contacts = 0
+
+    @property
+    def t(self) -> float:
+
+        return self.ensemble.t
+
+    def positions(self) -> np.ndarray:
+        """Returns the (n_systems, n_links, 2) position of every bob."""
+
+        pivot = (self.pivots[:, None, 0], self.pivots[:, None, 1])
+        return positions(self.ensemble.angles, self.ensemble.lengths, pivot)
+
+    def collide(self) -> int:
+        """Resolves every contact of the current state in place and returns their number."""
+
+        chain = self.ensemble
+        n_systems, n_links = chain.angles.shape
+        points = self.positions().reshape(-1, 2)
+        radii = bob_radii(chain.masses).ravel()
+
+        i, j = find_pairs(points, radii)
+        sys_i, link_i = np.divmod(i, n_links)
+        sys_j, link_j = np.divmod(j, n_links)
+        keep = (sys_i != sys_j) | (np.abs(link_i - link_j) > 1)
+        i, j, sys_i, link_i, sys_j, link_j = (a[keep] for a in (i, j, sys_i, link_i, sys_j, link_j))
+        self.n_contacts = len(i)
+        if not self.n_contacts:
+            return 0
+
+        delta = points[j] - points[i]
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        normal = np.where(dist[:, None] > 0, delta / np.maximum(dist, 1e-12)[:, None], (1.0, 0.0))
+        depth = radii[i] + radii[j] - dist
+
+        # n . d(bob)/d(a_m) for every link m above the bob, and 0 below it
+        links = np.arange(n_links)
+
+        def contact_direction(system: np.ndarray, link: np.ndarray) -> np.ndarray:
+            angles, lengths = chain.angles[system], chain.lengths[system]
+            along = lengths * (np.cos(angles) * normal[:, 1:] - np.sin(angles) * normal[:, :1])
+            return np.where(links <= link[:, None], along, 0.0)
+
+        g_i = -contact_direction(sys_i, link_i)
+        g_j = contact_direction(sys_j, link_j)
+        # M^-1 J^T n, inverting the mass matrix of every chain in contact once
+        involved = np.union1d(sys_i, sys_j)
+        inverse = np.linalg.inv(mass_matrix(chain.angles[involved], chain.masses[involved],
+                                            chain.lengths[involved]))
+        u_i = np.einsum('cij,cj->ci', inverse[np.searchsorted(involved, sys_i)], g_i)
+        u_j = np.einsum('cij,cj->ci', inverse[np.searchsorted(involved, sys_j)], g_j)
+
+        # the effective inverse mass along the normal, with the cross terms if one chain holds both bobs
+        same = sys_i == sys_j
+        stiffness = np.einsum('ij,ij->i', g_i, u_i) + np.einsum('ij,ij->i', g_j, u_j)
+        stiffness += np.where(same, np.einsum('ij,ij->i', g_i, u_j) + np.einsum('ij,ij->i', g_j, u_i), 0.0)
+        counts = np.bincount(np.concatenate((sys_i, sys_j)), minlength=n_systems)
+        relax = 1 / np.maximum(counts[sys_i], counts[sys_j]) / stiffness
+
+        vels = chain.angular_vels
+        approach = np.einsum('ij,ij->i', g_i, vels[sys_i]) + np.einsum('ij,ij->i', g_j, vels[sys_j])
+        target = -self.restitution * np.minimum(approach, 0.0)
+        impulse = np.zeros(self.n_contacts)
+        for _ in range(self.iterations):
+            speed = np.einsum('ij,ij->i', g_i, vels[sys_i]) + np.einsum('ij,ij->i', g_j, vels[sys_j])
+            total = np.maximum(impulse + relax * (target - speed), 0.0)
+            change, impulse = total - impulse, total
+            np.add.at(vels, sys_i, u_i * change[:, None])
+            np.add.at(vels, sys_j, u_j * change[:, None])
+
+        # push the overlap out along the same directions, which moves no bob off its rod
+        shift = relax * np.maximum(depth, 0.0)
+        np.add.at(chain.angles, sys_i, u_i * shift[:, None])
+        np.add.at(chain.angles, sys_j, u_j * shift[:, None])
+        return self.n_contacts
+
+    def step(self, dt: float) -> None:
+
+        self.ensemble.step(dt)
+        self.collide()
+
+    def run(self, dt: float, n_steps: int) -> None:
+
+        for _ in range(n_steps):
+            self.step(dt)
+
+    def energy(self) -> float:
+
+        return float(self.ensemble.energy().sum())
+
+
+def benchmark(n_bobs: int, n_steps: int=5, seed: int=0) -> dict:
+    """
+    Measures collision handling for n_bobs single pendulums hanging from a square grid.
+
+    The pivots are 150 px apart and the 100 px rods start at random angles, so every bob can
+    reach its neighbours' and the number of contacts per bob stays the same at every size.
+
+    Args:
+        n_bobs (int): The number of pendulums.
+        n_steps (int): The number of timed steps. Default is 5.
+        seed (int): The seed of the initial angles. Default is 0.
+
+    Returns:
+        dict: Seconds per call of find_pairs() ('grid'), brute_force_pairs() ('brute_force')
+            and Scene.step() ('step'), and the contacts found in the first state ('contacts').
+    """
+
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n_bobs)))
+    pivots = 150.0 * np.stack(np.divmod(np.arange(n_bobs), side), axis=-1)
+    scene = Scene(pivots, rng.uniform(0, 2 * np.pi, (n_bobs, 1)), np.full(1, 5.0), np.full(1, 100.0),
+                  rng.normal(0, 2, (n_bobs, 1)))
+    points = scene.positions().reshape(-1, 2)
+    radii = bob_radii(scene.ensemble.masses).ravel()
+
+    timings = {}
+    for name, func in (('grid', find_pairs), ('brute_force', brute_force_pairs)):
+        func(points, radii)
+        start = time.perf_counter()
+        pairs = func(points, radii)
+        timings[name] = time.perf_counter() - start
+    timings['contacts'] = len(pairs[0])
+
+    scene.step(1e-3)
+    start = time.perf_counter()
+    scene.run(1e-3, n_steps)
+    timings['step'] = (time.perf_counter() - start) / n_steps
+    return timings
+
+
+if __name__ == '__main__':
+
+    print(f"{'bobs':>8} {'contacts':>9} {'grid':>10} {'brute force':>12} {'scene step':>11}")
+    for n_bobs in (100, 1_000, 10_000):
+        result = benchmark(n_bobs)
+        print(f"{n_bobs:>8} {result['contacts']:>9} {result['grid'] * 1e3:>8.2f}ms"
+              f" {result['brute_force'] * 1e3:>10.2f}ms {result['step'] * 1e3:>9.2f}ms")
@@ -0,0 +1,218 @@
+"""
+A module containing precomputed pivot forcing for driven pendulum chains.
+
+A ForcingTable holds the pivot acceleration (and optionally displacement) sampled on a
+uniform time grid. Looking a value up is one index computation and one linear
+interpolation, so it costs the same whether the forcing came from a closed form, a Python
+function or measured data, and Chain.run() with the numba backend samples every RK4 stage
+of a whole run in one vectorized call before entering the compiled kernel. That keeps
+10 kHz+ drives affordable for ensembles, where a Python call per stage per step would not be.
+
+Periodic tables hold exactly one period and wrap around; other tables hold their first or
+last sample outside the sampled range.
+
+Accelerations are in the app's units, pixels per second squared with y pointing down.
+
+Classes:
+    ForcingTable:
+        Represents a sampled pivot acceleration.
+
+        Methods:
+            __init__(acc: np.ndarray, dt: float, t0: float=0.0, periodic: bool=False,
+                     displacement: np.ndarray=None) -> None:
+                Initializes a new ForcingTable object.
+            __call__(t: float) -> np.ndarray:
+                Returns the pivot acceleration at time t.
+            sample(times: np.ndarray) -> np.ndarray:
+                Returns the pivot acceleration at every time of an array.
+            offset(t: float) -> np.ndarray:
+                Returns the pivot displacement at time t.
+
+Functions:
+    constant(acc: tuple=(0.0, 0.0)) -> ForcingTable:
+        Returns a table with a constant pivot acceleration.
+    harmonic(amplitude: float, frequency: float, direction: tuple=(0.0, 1.0), phase: float=0.0,
+             samples_per_period: int=256) -> ForcingTable:
+        Returns the forcing of a pivot oscillating along a line.
+    kapitza(amplitude: float, frequency: float, samples_per_period: int=256) -> ForcingTable:
+        Returns the vertical oscillation of the Kapitza pendulum.
+    kapitza_threshold(length: float, g: float=G) -> float:
+        Returns the minimum amplitude times angular frequency that stabilizes the inverted pendulum.
+    from_function(func: Callable, duration: float, dt: float, periodic: bool=False) -> ForcingTable:
+        Samples a function of time into a table once.
+    from_displacement(positions: np.ndarray, dt: float, t0: float=0.0) -> ForcingTable:
+        Returns the table of a sampled pivot trajectory.
+"""
+
+from typing import Callable
+import numpy as np
+
+from physics import G
+
+
+class ForcingTable:
+    """
+    Represents a pivot acceleration sampled on a uniform time grid.
+
+    Attributes:
+        acc (np.ndarray): The (n, 2) sampled accelerations.
+        dt (float): The time between samples.
+        t0 (float): The time of the first sample.
+        periodic (bool): Whether the table repeats every n * dt.
+        displacement (np.ndarray): The (n, 2) sampled pivot offsets, None if unknown.
+        bias (np.ndarray): A constant acceleration added to every lookup, e.g. from a user
+            dragging the pivot on top of a drive.
+    """
+
+    def __init__(self, acc: np.ndarray, dt: float, t0: float=0.0, periodic: bool=False,
+                 displacement: np.ndarray=None) -> None:
+
+        acc = np.asarray(acc, dtype=float).reshape(-1, 2)
+        if len(acc) < 2:
+            raise ValueError("a forcing table needs at least two samples")
+
+        self.acc = acc
+        self.dt = float(dt)
+        self.t0 = float(t0)
+        self.periodic = periodic
+        self.displacement = None if displacement is None else np.asarray(displacement, dtype=float).reshape(-1, 2)
+        self.bias = np.zeros(2)
+
+        # a periodic table gets its first sample appended, so the sample after the last one
+        # never needs a second wrap
+        self._acc = np.concatenate((acc, acc[:1])) if periodic else acc
+        if self.displacement is not None:
+            disp = self.displacement
+            self._disp = np.concatenate((disp, disp[:1])) if periodic else disp
+
+    @property
+    def period(self) -> float:
+
+        return len(self.acc) * self.dt
+
+    def _locate(self, times: np.ndarray) -> tuple:
+        """Returns the sample index below every time and the fraction of the way to the next one."""
+
+        u = (np.asarray(times, dtype=float) - self.t0) / self.dt
+        if self.periodic:
+            u = np.mod(u, len(self.acc))
+        else:
+            u = np.clip(u, 0, len(self.acc) - 1)
+        index = np.minimum(u.astype(np.intp), len(self._acc) - 2)
+        return index, u - index
+
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        """Returns the pivot acceleration at every time, of shape times.shape + (2,)."""
+
+        index, frac = self._locate(times)
+        frac = frac[..., None]
+        return self._acc[index] * (1 - frac) + self._acc[index + 1] * frac + self.bias
+
+    def __call__(self, t: float) -> np.ndarray:
+
+        # scalar version of sample(), called once per derivative evaluation
+        u = (t - self.t0) / self.dt
+        n = len(self.acc)
+        u = u % n if self.periodic else min(max(u, 0.0), n - 1.0)
+        index = min(int(u), len(self._acc) - 2)
+        frac = u - index
+        return self._acc[index] * (1 - frac) + self._acc[index + 1] * frac + self.bias
+
+    def offset(self, t: float) -> np.ndarray:
+        """Returns the pivot displacement at time t, zero if the table has no displacement."""
+
+        if self.displacement is None:
+            return np.zeros(2)
+        index, frac = self._locate(t)
+        return self._disp[index] * (1 - frac) + self._disp[index + 1] * frac
+
+
+def constant(acc: tuple=(0.0, 0.0)) -> ForcingTable:
+
+    return ForcingTable(np.tile(np.asarray(acc, dtype=float), (2, 1)), dt=1.0)
+
+
+def harmonic(amplitude: float, frequency: float, direction: tuple=(0.0, 1.0), phase: float=0.0,
+             samples_per_period: int=256) -> ForcingTable:
+    """
+    Returns the forcing of a pivot moving as amplitude * cos(2 pi frequency t + phase) along direction.
+
+    Args:
+        amplitude (float): The displacement amplitude in pixels.
+        frequency (float): The frequency in Hz.
+        direction (tuple): The direction of motion, normalised. Default is (0.0, 1.0), vertical.
+        phase (float): The phase at t = 0. Default is 0.0.
+        samples_per_period (int): The table resolution. Default is 256.
+
+    Returns:
+        ForcingTable: A periodic table of one period, with displacement.
+    """
+
+    direction = np.asarray(direction, dtype=float)
+    direction = direction / np.linalg.norm(direction)
+    omega = 2 * np.pi * frequency
+    times = np.arange(samples_per_period) / (samples_per_period * frequency)
+    disp = amplitude * np.cos(omega * times + phase)[:, None] * direction
+    return ForcingTable(-omega ** 2 * disp, 1 / (samples_per_period * frequency), periodic=True,
+                        displacement=disp)
+
+
+def kapitza(amplitude: float, frequency: float, samples_per_period: int=256) -> ForcingTable:
+    """
+    Returns the vertical pivot oscillation of the Kapitza pendulum.
+
+    With amplitude * 2 pi frequency above kapitza_threshold() a single pendulum balances
+    upside down.
+    """
+
+    return harmonic(amplitude, frequency, (0.0, 1.0), 0.0, samples_per_period)
+
+
+def kapitza_threshold(length: float, g: float=G) -> float:
+    """Returns the amplitude times angular frequency above which a pendulum of this length is stable inverted."""
+
+    return float(np.sqrt(2 * g * length))
+
+
+def from_function(func: Callable, duration: float, dt: float, periodic: bool=False) -> ForcingTable:
+    """
+    Samples a function of time into a table once, so it is never called during integration.
+
+    Args:
+        func (Callable): Returns the (A_x, A_y) pivot acceleration at time t. Called once per
+            sample, or once with the whole time array if it accepts one.
+        duration (float): The sampled time span, one period if periodic.
+        dt (float): The time between samples.
+        periodic (bool): Whether the table repeats every duration. Default is False.
+
+    Returns:
+        ForcingTable: The sampled table.
+    """
+
+    n = max(2, int(round(duration / dt)) + (0 if periodic else 1))
+    times = np.arange(n) * dt
+    try:
+        acc = np.asarray(func(times), dtype=float)
+        if acc.shape != (n, 2):
+            raise ValueError
+    except (TypeError, ValueError):
+        acc = np.array([func(t) for t in times], dtype=float)
+    return ForcingTable(acc, dt, periodic=periodic)
+
+
+def from_displacement(positions: np.ndarray, dt: float, t0: float=0.0) -> ForcingTable:
+    """
+    Returns the table of a sampled pivot trajectory, differentiating it twice.
+
+    Args:
+        positions (np.ndarray): (n, 2) pivot positions sampled every dt.
+        dt (float): The time between samples.
+        t0 (float): The time of the first sample. Default is 0.0.
+
+    Returns:
+        ForcingTable: The accelerations, with positions relative to the first as displacement.
+    """
+
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    acc = np.gradient(np.gradient(positions, dt, axis=0), dt, axis=0)
+    return ForcingTable(acc, dt, t0, displacement=positions - positions[0])
@@ -0,0 +1,260 @@
+"""
+A module containing optional compiled kernels for the chain equations of motion.
+
+When Numba is installed the derivative function and a fixed-step RK4 integrator are
+JIT-compiled to scalar loops, which removes the interpreter and temporary-array overhead
+that dominates small chains. When it is not installed HAVE_NUMBA is False and physics.Chain
+falls back to the pure-NumPy path; the kernels below still import but run as plain Python.
+
+All kernels take 2-D (n_systems, n_links) float64 arrays and update their outputs in place.
+A driven pivot enters as its acceleration (ax, ay): the kernels use g - ay in place of g and
+add the ax sin(a_j) term, see physics.
+
+Functions:
+    accelerations(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                  lengths: np.ndarray, g: float, out: np.ndarray, ax: float=0.0, ay: float=0.0) -> None:
+        Writes the angular accelerations of every chain into out.
+    rk4_run(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+            lengths: np.ndarray, g: float, dt: float, n_steps: int, forcing: np.ndarray) -> None:
+        Advances every chain by n_steps classical Runge-Kutta steps.
+    single_threaded() -> None:
+        Limits numba's parallel kernels to one thread, for pool worker processes.
+    benchmark(n_links: int, backend: str, n_steps: int=2000, dt: float=1e-4) -> float:
+        Measures single-chain RK4 steps per second for a backend.
+"""
+
+import time
+from math import cos, sin
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+def single_threaded() -> None:
+    """
+    Limits numba's parallel kernels to one thread in this process.
+
+    Passed as the initializer of process pools, whose workers already run one per core:
+    without it every worker would start a numba thread per core as well.
+    """
+
+    if HAVE_NUMBA:
+        import numba
+        numba.set_num_threads(1)
+
+
+@njit(cache=True)
+def _chain_accelerations(a, w, m, l, g, ax, out, lhs, work):
+    """
+    Solves one chain's equations of motion by Gaussian elimination with partial pivoting.
+
+    lhs is (n_links, n_links) and work is (4, n_links) scratch, so nothing is allocated
+    per call.
+    """
+
+    n = a.shape[0]
+    if n == 2:
+        _double_accelerations(a, w, m, l, g, ax, out)
+        return
+
+    mu, cos_a, sin_a, rhs = work[0], work[1], work[2], work[3]
+    total = 0.0
+    for j in range(n - 1, -1, -1):
+        total += m[j]
+        mu[j] = total
+    for j in range(n):
+        cos_a[j] = cos(a[j])
+        sin_a[j] = sin(a[j])
+
+    # cos(a_j - a_k) and sin(a_j - a_k) are expanded from the per-link values above, so
+    # only 2n trig calls are made instead of 2n^2
+    for j in range(n):
+        r = mu[j] * (g * cos_a[j] + ax * sin_a[j])
+        for k in range(n):
+            coupled = mu[max(j, k)] * l[k]
+            lhs[j, k] = coupled * (cos_a[j] * cos_a[k] + sin_a[j] * sin_a[k])
+            r -= coupled * (sin_a[j] * cos_a[k] - cos_a[j] * sin_a[k]) * w[k] * w[k]
+        rhs[j] = r
+
+    for col in range(n):
+        pivot = col
+        for row in range(col + 1, n):
+            if abs(lhs[row, col]) > abs(lhs[pivot, col]):
+                pivot = row
+        if pivot != col:
+            for k in range(col, n):
+                lhs[col, k], lhs[pivot, k] = lhs[pivot, k], lhs[col, k]
+            rhs[col], rhs[pivot] = rhs[pivot], rhs[col]
+        for row in range(col + 1, n):
+            factor = lhs[row, col] / lhs[col, col]
+            for k in range(col, n):
+                lhs[row, k] -= factor * lhs[col, k]
+            rhs[row] -= factor * rhs[col]
+
+    for j in range(n - 1, -1, -1):
+        r = rhs[j]
+        for k in range(j + 1, n):
+            r -= lhs[j, k] * out[k]
+        out[j] = r / lhs[j, j]
+
+
+@njit(cache=True)
+def _double_accelerations(a, w, m, l, g, ax, out):
+    """Closed-form double pendulum, mirroring physics._accelerations_2link."""
+
+    out[0], out[1] = _double_scalar(a[0], a[1], w[0], w[1], m[1], m[0] + m[1], l[0], l[1], g, ax)
+
+
+@njit(cache=True)
+def _double_rk4(a, w, m, l, g, dt, n_steps, forcing):
+    """RK4 for one double pendulum kept entirely in scalars, so the state never leaves registers."""
+
+    a0, a1, w0, w1 = a[0], a[1], w[0], w[1]
+    m1, mu0, l0, l1 = m[1], m[0] + m[1], l[0], l[1]
+    h = 0.5 * dt
+    driven = forcing.shape[0] > 0
+    g0 = g1 = g2 = g
+    x0 = x1 = x2 = 0.0
+
+    for i in range(n_steps):
+        if driven:
+            x0, g0 = forcing[i, 0, 0], g - forcing[i, 0, 1]
+            x1, g1 = forcing[i, 1, 0], g - forcing[i, 1, 1]
+            x2, g2 = forcing[i, 2, 0], g - forcing[i, 2, 1]
+        k1a0, k1a1 = w0, w1
+        k1w0, k1w1 = _double_scalar(a0, a1, w0, w1, m1, mu0, l0, l1, g0, x0)
+        k2a0, k2a1 = w0 + h * k1w0, w1 + h * k1w1
+        k2w0, k2w1 = _double_scalar(a0 + h * k1a0, a1 + h * k1a1, k2a0, k2a1, m1, mu0, l0, l1, g1, x1)
+        k3a0, k3a1 = w0 + h * k2w0, w1 + h * k2w1
+        k3w0, k3w1 = _double_scalar(a0 + h * k2a0, a1 + h * k2a1, k3a0, k3a1, m1, mu0, l0, l1, g1, x1)
+        k4a0, k4a1 = w0 + dt * k3w0, w1 + dt * k3w1
+        k4w0, k4w1 = _double_scalar(a0 + dt * k3a0, a1 + dt * k3a1, k4a0, k4a1, m1, mu0, l0, l1, g2, x2)
+
+        a0 += (dt / 6) * (k1a0 + 2 * k2a0 + 2 * k3a0 + k4a0)
+        a1 += (dt / 6) * (k1a1 + 2 * k2a1 + 2 * k3a1 + k4a1)
+        w0 += (dt / 6) * (k1w0 + 2 * k2w0 + 2 * k3w0 + k4w0)
+        w1 += (dt / 6) * (k1w1 + 2 * k2w1 + 2 * k3w1 + k4w1)
+
+    a[0], a[1], w[0], w[1] = a0, a1, w0, w1
+
+
+@njit(cache=True)
+def _double_scalar(a0, a1, w0, w1, m1, mu0, l0, l1, g, ax):
+
+    s, c = sin(a0 - a1), cos(a0 - a1)
+    r0 = mu0 * (g * cos(a0) + ax * sin(a0)) - m1 * l1 * s * w1 * w1
+    r1 = g * cos(a1) + ax * sin(a1) + l0 * s * w0 * w0
+    det = mu0 - m1 * c * c
+    return (r0 - m1 * c * r1) / (l0 * det), (mu0 * r1 - c * r0) / (l1 * det)
+
+
+@njit(cache=True)
+def accelerations(angles, angular_vels, masses, lengths, g, out, ax=0.0, ay=0.0):
+
+    n_systems, n_links = angles.shape
+    lhs = np.empty((n_links, n_links))
+    work = np.empty((4, n_links))
+    for s in range(n_systems):
+        _chain_accelerations(angles[s], angular_vels[s], masses[s], lengths[s], g - ay, ax, out[s], lhs, work)
+
+
+@njit(cache=True, parallel=True)
+def rk4_run(angles, angular_vels, masses, lengths, g, dt, n_steps, forcing):
+    """
+    Advances every chain by n_steps classical fourth order Runge-Kutta steps in place.
+
+    Chains are independent, so the batch is split across threads and each chain runs all
+    of its steps without returning to Python. forcing is the (n_steps, 3, 2) pivot
+    acceleration at the start, middle and end of every step, shared by all chains, or an
+    empty (0, 3, 2) array for a fixed pivot.
+    """
+
+    n_systems, n_links = angles.shape
+    for s in prange(n_systems):
+        if n_links == 2:
+            _double_rk4(angles[s], angular_vels[s], masses[s], lengths[s], g, dt, n_steps, forcing)
+            continue
+
+        lhs = np.empty((n_links, n_links))
+        work = np.empty((4, n_links))
+        a, w = angles[s], angular_vels[s]
+        m, l = masses[s], lengths[s]
+        ta, tw = np.empty(n_links), np.empty(n_links)
+        k1, k2, k3, k4 = np.empty(n_links), np.empty(n_links), np.empty(n_links), np.empty(n_links)
+        driven = forcing.shape[0] > 0
+        g0 = g1 = g2 = g
+        x0 = x1 = x2 = 0.0
+
+        for i in range(n_steps):
+            if driven:
+                x0, g0 = forcing[i, 0, 0], g - forcing[i, 0, 1]
+                x1, g1 = forcing[i, 1, 0], g - forcing[i, 1, 1]
+                x2, g2 = forcing[i, 2, 0], g - forcing[i, 2, 1]
+            _chain_accelerations(a, w, m, l, g0, x0, k1, lhs, work)
+            for j in range(n_links):
+                ta[j] = a[j] + 0.5 * dt * w[j]
+                tw[j] = w[j] + 0.5 * dt * k1[j]
+            _chain_accelerations(ta, tw, m, l, g1, x1, k2, lhs, work)
+            for j in range(n_links):
+                ta[j] = a[j] + 0.5 * dt * (w[j] + 0.5 * dt * k1[j])
+                tw[j] = w[j] + 0.5 * dt * k2[j]
+            _chain_accelerations(ta, tw, m, l, g1, x1, k3, lhs, work)
+            for j in range(n_links):
+                ta[j] = a[j] + dt * (w[j] + 0.5 * dt * k2[j])
+                tw[j] = w[j] + dt * k3[j]
+            _chain_accelerations(ta, tw, m, l, g2, x2, k4, lhs, work)
+
+            # the angle slopes of the four stages are the stage velocities w + c * dt * k
+            for j in range(n_links):
+                a[j] += (dt / 6) * (6 * w[j] + dt * (k1[j] + k2[j] + k3[j]))
+                w[j] += (dt / 6) * (k1[j] + 2 * k2[j] + 2 * k3[j] + k4[j])
+
+
+def benchmark(n_links: int, backend: str, n_steps: int=2000, dt: float=1e-4) -> float:
+    """
+    Measures single-chain RK4 throughput for a backend.
+
+    Args:
+        n_links (int): The number of links in the chain.
+        backend (str): 'numpy' or 'numba'.
+        n_steps (int): The number of timed steps. Default is 2000.
+        dt (float): The time step. Default is 1e-4.
+
+    Returns:
+        float: RK4 steps per second.
+    """
+
+    from physics import Chain
+
+    chain = Chain(np.linspace(0.1, 1.0, n_links), np.ones(n_links), np.full(n_links, 300 / n_links),
+                  backend=backend)
+    chain.run(dt, 1)
+
+    start = time.perf_counter()
+    chain.run(dt, n_steps)
+    return n_steps / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+
+    backends = ('numpy', 'numba') if HAVE_NUMBA else ('numpy',)
+    if not HAVE_NUMBA:
+        print("numba is not installed, only the numpy backend is measured")
+
+    for n_links in (2, 10, 100):
+        n_steps = 20_000 // n_links
+        rates = {backend: benchmark(n_links, backend, n_steps) for backend in backends}
+        line = "  ".join(f"{backend}: {rate:>12,.0f} steps/s" for backend, rate in rates.items())
+        if HAVE_NUMBA:
+            line += f"  speedup: x{rates['numba'] / rates['numpy']:.1f}"
+        print(f"{n_links:>3} links  {line}")
@@ -0,0 +1,335 @@
+"""
+A module containing constant-memory statistics for long simulation runs.
+
+Every accumulator here holds a fixed number of values however many samples it sees, so a
+soak run can run for days with flat memory. Nothing keeps per-step history: an OnlineStats
+object observes the chain every `sample_every` steps, updates the accumulators in place, and
+every `interval` simulated seconds appends one JSON line with the current aggregates to a
+snapshot file (or hands it to a callback) and forgets it.
+
+    RunningMoments  Welford mean and variance plus minimum and maximum, element-wise.
+    Histogram       Fixed-bin counts with under- and overflow.
+    OnlineStats     Angle and angular velocity moments, an angle histogram, flip counts and
+                    energy drift for a Chain or Ensemble.
+
+Angles are histogrammed as the deviation from hanging straight down wrapped to [-pi, pi),
+and a flip is counted every time a link swings over the top in either direction.
+
+Energy drift measures integration error, so it is only reported while the energy should be
+conserved: with no pivot forcing and fixed masses, lengths and g. A sample that finds the
+parameters changed, or the chain forced since the last sample, restarts the measurement
+from the energy it finds once the chain runs free again. max_drift is the largest drift
+over all such stretches, and the drift of a snapshot taken while forced is None.
+
+Classes:
+    RunningMoments:
+        Represents streaming element-wise moments and extrema.
+
+        Methods:
+            __init__(shape: tuple=()) -> None:
+                Initializes a new RunningMoments object.
+            update(x: np.ndarray) -> None:
+                Adds one sample.
+            var() -> np.ndarray:
+                Returns the population variance.
+            std() -> np.ndarray:
+                Returns the population standard deviation.
+            summary() -> dict:
+                Returns count, mean, std, min and max as JSON-ready lists.
+
+    Histogram:
+        Represents fixed-bin counts of a stream of values.
+
+        Methods:
+            __init__(bins: int, value_range: tuple) -> None:
+                Initializes a new Histogram object.
+            update(x: np.ndarray) -> None:
+                Counts every value of x.
+            summary() -> dict:
+                Returns the bin edges and counts as JSON-ready lists.
+
+    OnlineStats:
+        Represents a statistics pipeline attached to a simulation loop.
+
+        Methods:
+            __init__(chain: Chain, sample_every: int=1, interval: float=60.0, path: str=None,
+                     on_snapshot: Callable=None, bins: int=72) -> None:
+                Initializes a new OnlineStats object.
+            observe(chain: Chain, n_steps: int=1) -> None:
+                Called after every physics step, or every block of n_steps steps.
+            snapshot() -> dict:
+                Returns the current aggregates.
+            close() -> None:
+                Emits a final snapshot and closes the snapshot file.
+"""
+
+import json
+import argparse
+from typing import Callable
+import numpy as np
+
+import physics
+
+REST_ANGLE = np.pi / 2
+
+
+class RunningMoments:
+    """
+    Represents streaming element-wise moments and extrema.
+
+    Attributes:
+        count (int): The number of samples seen.
+        mean (np.ndarray): The running mean.
+        minimum (np.ndarray): The smallest value seen.
+        maximum (np.ndarray): The largest value seen.
+    """
+
+    def __init__(self, shape: tuple=()) -> None:
+
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self._delta = np.zeros(shape)
+        self._work = np.zeros(shape)
+        self.minimum = np.full(shape, np.inf)
+        self.maximum = np.full(shape, -np.inf)
+
+    def update(self, x: np.ndarray) -> None:
+
+        self.count += 1
+        # Welford's update, through preallocated buffers so a sample allocates no arrays
+        np.subtract(x, self.mean, out=self._delta)
+        np.divide(self._delta, self.count, out=self._work)
+        self.mean += self._work
+        np.subtract(x, self.mean, out=self._work)
+        self._work *= self._delta
+        self._m2 += self._work
+        np.minimum(self.minimum, x, out=self.minimum)
+        np.maximum(self.maximum, x, out=self.maximum)
+
+    def var(self) -> np.ndarray:
+
+        return self._m2 / self.count if self.count else np.full_like(self._m2, np.nan)
+
+    def std(self) -> np.ndarray:
+
+        return np.sqrt(self.var())
+
+    def summary(self) -> dict:
+
+        return {'count': self.count, 'mean': self.mean.tolist(), 'std': self.std().tolist(),
+                'min': self.minimum.tolist(), 'max': self.maximum.tolist()}
+
+
+class Histogram:
+    """
+    Represents fixed-bin counts of a stream of values.
+
+    Attributes:
+        edges (np.ndarray): The bins + 1 bin edges.
+        counts (np.ndarray): The count of every bin.
+        underflow (int): The number of values below the first edge.
+        overflow (int): The number of values at or above the last edge.
+    """
+
+    def __init__(self, bins: int, value_range: tuple) -> None:
+
+        self.edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self._scale = bins / (value_range[1] - value_range[0])
+
+    def update(self, x: np.ndarray) -> None:
+
+        index = np.floor((np.ravel(x) - self.edges[0]) * self._scale).astype(np.intp)
+        below, above = index < 0, index >= len(self.counts)
+        self.underflow += int(below.sum())
+        self.overflow += int(above.sum())
+        self.counts += np.bincount(index[~(below | above)], minlength=len(self.counts))
+
+    def summary(self) -> dict:
+
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist(),
+                'underflow': self.underflow, 'overflow': self.overflow}
+
+
+class OnlineStats:
+    """
+    Represents a statistics pipeline attached to a simulation loop.
+
+    Call observe(chain) after every physics step, or observe(chain, n_steps) after a block of
+    steps. A sample is taken whenever another sample_every steps have passed, and a snapshot
+    is emitted whenever the chain time passes the next multiple of interval.
+
+    Attributes:
+        sample_every (int): The number of physics steps per sample.
+        interval (float): The simulated time between snapshots.
+        angles (RunningMoments): Moments of the angle deviation from rest.
+        angular_vels (RunningMoments): Moments of the angular velocities.
+        histogram (Histogram): Counts of the wrapped angle deviation from rest, over all links.
+        flips (np.ndarray): The number of times each link has swung over the top.
+        initial_energy (np.ndarray): The energy drift is measured from: at attach time, or at
+            the last parameter change or end of forcing. None while the chain is forced.
+        max_drift (float): The largest relative energy drift seen, over all systems.
+        n_energy_resets (int): The number of times initial_energy was taken again.
+        n_steps (int): The number of physics steps observed.
+        n_snapshots (int): The number of snapshots emitted.
+    """
+
+    def __init__(self, chain, sample_every: int=1, interval: float=60.0, path: str=None,
+                 on_snapshot: Callable=None, bins: int=72) -> None:
+
+        self.sample_every = sample_every
+        self.interval = interval
+        self.on_snapshot = on_snapshot
+        self._file = open(path, 'a') if path else None
+
+        shape = np.shape(chain.angles)
+        self.angles = RunningMoments(shape)
+        self.angular_vels = RunningMoments(shape)
+        self.histogram = Histogram(bins, (-np.pi, np.pi))
+        self.flips = np.zeros(shape, dtype=np.int64)
+        self._winding = self._windings(chain.angles)
+
+        self._masses, self._lengths, self._g = np.array(chain.masses), np.array(chain.lengths), chain.g
+        self._forced = chain.forcing is not None
+        self.initial_energy = None if self._forced else self._energy(chain)
+        self.max_drift = 0.0
+        self._drift = None if self._forced else 0.0
+        self.n_energy_resets = 0
+
+        self.n_steps = 0
+        self._next_sample = sample_every
+        self.n_snapshots = 0
+        self._emitted_steps = -1
+        self.t = chain.t
+        self._next_snapshot = chain.t + interval
+
+    @staticmethod
+    def _windings(angles: np.ndarray) -> np.ndarray:
+        """Returns how many times each link has gone over the top, changing by one per flip."""
+
+        return np.floor((angles - REST_ANGLE + np.pi) / (2 * np.pi)).astype(np.int64)
+
+    @staticmethod
+    def _energy(chain) -> np.ndarray:
+
+        return physics.total_energy(chain.angles, chain.angular_vels, chain.masses, chain.lengths, chain.g)
+
+    def observe(self, chain, n_steps: int=1) -> None:
+        """Records that chain has advanced by n_steps physics steps since the last call."""
+
+        self.n_steps += n_steps
+        # a drive on for a few steps between samples still breaks energy conservation
+        self._forced |= chain.forcing is not None
+        if self.n_steps >= self._next_sample:
+            self._sample(chain)
+            while self._next_sample <= self.n_steps:
+                self._next_sample += self.sample_every
+        if chain.t >= self._next_snapshot:
+            self.t = chain.t
+            self._emit()
+            while self._next_snapshot <= chain.t:
+                self._next_snapshot += self.interval
+
+    def _sample(self, chain) -> None:
+
+        self.t = chain.t
+        deviation = chain.angles - REST_ANGLE
+        self.angles.update(deviation)
+        self.angular_vels.update(chain.angular_vels)
+        self.histogram.update((deviation + np.pi) % (2 * np.pi) - np.pi)
+
+        winding = self._windings(chain.angles)
+        self.flips += np.abs(winding - self._winding)
+        self._winding = winding
+
+        changed = not (chain.g == self._g and np.array_equal(chain.masses, self._masses)
+                       and np.array_equal(chain.lengths, self._lengths))
+        if changed:
+            self._masses, self._lengths, self._g = np.array(chain.masses), np.array(chain.lengths), chain.g
+        disturbed = changed or self._forced
+        self._forced = chain.forcing is not None
+
+        if self._forced:
+            self.initial_energy = self._drift = None
+        elif disturbed or self.initial_energy is None:
+            self.initial_energy = self._energy(chain)
+            self._drift = 0.0
+            self.n_energy_resets += 1
+        else:
+            scale = np.maximum(np.abs(self.initial_energy), 1e-12)
+            self._drift = float(np.max(np.abs(self._energy(chain) - self.initial_energy) / scale))
+            self.max_drift = max(self.max_drift, self._drift)
+
+    def snapshot(self) -> dict:
+
+        return {
+            't': self.t,
+            'steps': self.n_steps,
+            'energy': {'drift': self._drift, 'max_drift': self.max_drift, 'resets': self.n_energy_resets},
+            'flips': self.flips.tolist(),
+            'angles': self.angles.summary(),
+            'angular_vels': self.angular_vels.summary(),
+            'angle_histogram': self.histogram.summary(),
+        }
+
+    def _emit(self) -> None:
+
+        snapshot = self.snapshot()
+        self.n_snapshots += 1
+        self._emitted_steps = self.n_steps
+        if self._file:
+            self._file.write(json.dumps(snapshot) + '\n')
+            self._file.flush()
+        if self.on_snapshot:
+            self.on_snapshot(snapshot)
+
+    def close(self) -> None:
+
+        if self._emitted_steps != self.n_steps:
+            self._emit()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "OnlineStats":
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run a headless soak simulation, writing only rolling statistics.")
+    parser.add_argument('out', help="JSON lines file the snapshots are appended to")
+    parser.add_argument('--duration', type=float, default=3600.0, help="simulated seconds")
+    parser.add_argument('--dt', type=float, default=1e-3)
+    parser.add_argument('--method', default='rk4')
+    parser.add_argument('--interval', type=float, default=60.0, help="simulated seconds between snapshots")
+    parser.add_argument('--sample-every', type=int, default=10, help="physics steps between samples")
+    parser.add_argument('--angles', type=float, nargs='+', default=(0.1, 0.9))
+    parser.add_argument('--masses', type=float, nargs='+', default=(1, 1))
+    parser.add_argument('--radii', type=float, nargs='+', default=(2, 1), help="rod lengths in slider units")
+    parser.add_argument('--systems', type=int, default=0, help="run a perturbed ensemble of this many chains")
+    args = parser.parse_args()
+
+    chain = physics.Chain(args.angles, args.masses, [100 * r for r in args.radii], method=args.method)
+    if args.systems:
+        from ensemble import Ensemble
+        chain = Ensemble.from_chain(chain, args.systems, angle_spread=1e-3, seed=0)
+
+    def report(snapshot: dict) -> None:
+        print(f"t={snapshot['t']:>10.1f}  flips={int(np.sum(snapshot['flips']))}"
+              f"  max drift={snapshot['energy']['max_drift']:.2e}")
+
+    # the chain is stepped in blocks between samples, so observe() runs once per block
+    with OnlineStats(chain, args.sample_every, args.interval, args.out, report) as stats:
+        n_blocks = int(round(args.duration / (args.dt * args.sample_every)))
+        for _ in range(n_blocks):
+            chain.run(args.dt, args.sample_every)
+            stats.observe(chain, args.sample_every)
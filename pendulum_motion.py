@@ -1,17 +1,37 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
 import pygame
 import basicUI
-from math import cos, sin, tan
-
-pygame.init()
+import physics
+from recorder import TrajectoryRecorder
+from playback import Playback
+from ensemble import Ensemble
+from bulk_render import BulkRenderer
+from profiler import PhaseProfiler
+from online_stats import OnlineStats
+import checkpoint
+import collisions
+import forcing
+from checkpoint import Checkpointer
+from video_export import FramePipeline, open_writer
+from sim_worker import SimulationWorker
+from math import cos, sin, tan, ceil
 
 width, height = 1100, 600
 sim_width = 800
 ui_width = width - sim_width
 
-win = pygame.display.set_mode((width, height))
-pygame.display.set_caption("pendulum motion")
-clock = pygame.time.Clock()
+# created by setup() when the app is launched, so importing this module opens no window
+win = None
+clock = None
+chain = None
+renderer = None
+
 max_fps = 60
+hidden_fps = 5
 
 # COLOURS
 BG_COLOUR = (255, 250, 220)
@@ -19,7 +39,16 @@ UI_BG_COLOUR = (50, 50, 50)
 UI_ELEM_COLOUR = (100, 100, 100)
 PARTICLE_COLOUR = (255, 0, 0)
 
-g = 980.7
+g = physics.G
+physics_rate = 1000
+physics_dt = 1 / physics_rate
+physics_method = 'rk4'
+max_frame_time = 0.25
+ensemble_rate = 240
+stats_interval = 60.0
+checkpoint_interval = 5.0
+stats_sample_every = 10
+profile_phases = ('events', 'physics', 'sliders', 'particles', 'draw', 'display')
 
 class Particle:
 
@@ -54,14 +83,14 @@ class Particle:
                         self.pivot[1] + (self.radius*sin(self.angle)))
         
     
-    def draw_line(self, surface) -> None:
+    def draw_line(self, surface) -> pygame.Rect:
         
-        pygame.draw.line(surface, (0, 0, 0), self.pivot, self.center, width=2)
+        return pygame.draw.line(surface, (0, 0, 0), self.pivot, self.center, width=2)
     
     
-    def draw_particle(self, surface) -> None:
+    def draw_particle(self, surface) -> pygame.Rect:
 
-        pygame.draw.circle(surface, self.colour, self.center, (self.mass) + 10)
+        return pygame.draw.circle(surface, self.colour, self.center, (self.mass) + 10)
         
 
     def update(self) -> None:
@@ -85,108 +114,700 @@ def new_slider(name, center, min_val, max_val) -> basicUI.Slider:
     sld.set_center(center)
     sliders.update({name: sld})
     return sld
-    
-mass1 = new_slider("Mass 1:", (text_margin + sim_width + ui_width // 2, 100), 1, 40)
-radius1 = new_slider("Radius 1:", (text_margin + sim_width + ui_width // 2, 150), 1, 4)
-radius1.value = 2
-mass2 = new_slider("Mass 2:", (text_margin + sim_width + ui_width // 2, 200), 1, 40)
-radius2 = new_slider("Radius 2:", (text_margin + sim_width + ui_width // 2, 250), 1, 4)
 
 particles = []
-Particle(mass1, radius1, particles, 0.1)
-Particle(mass2, radius2, particles, 0.9)
 
-def draw_ui() -> None:
+def draw_ui(surface: pygame.Surface, status: str=None) -> None:
 
     ui_bg_rect = pygame.Rect(sim_width, 0, ui_width, height)
-    pygame.draw.rect(win, UI_BG_COLOUR, ui_bg_rect)
+    pygame.draw.rect(surface, UI_BG_COLOUR, ui_bg_rect)
     for slider_id in sliders:
         slider = sliders[slider_id]
-        slider.draw()
+        slider.draw(surface)
         x_pos = sim_width + text_margin
-        basicUI.text(win, slider_id, (x_pos, slider.bar.centery), UI_ELEM_COLOUR)
+        basicUI.text(surface, slider_id, (x_pos, slider.bar.centery), UI_ELEM_COLOUR)
+    if status:
+        basicUI.text(surface, status, (sim_width + ui_width // 2, height - 40), UI_ELEM_COLOUR, size=24)
 
-def draw_surface() -> None:
-    
-    win.fill(BG_COLOUR)
+class Renderer:
+    """
+    Draws frames by pushing only the parts of the window that changed.
 
-    for ptc in particles:
-        ptc.draw_line(win)
-    for ptc in particles:
-        ptc.draw_particle(win)
+    The UI panel is drawn once onto an offscreen layer and only redrawn when a slider's
+    value or knob position, or the status line, changes. In the simulation area the
+    rectangles covered by last frame's rods and bobs are erased and the new ones drawn, and
+    only the union of both is passed to display.update().
 
-    draw_ui()
+    draw() and present() are separate so the cost of drawing and of pushing pixels to the
+    display can be timed apart.
+    """
 
-    pygame.display.update()
+    def __init__(self, surface: pygame.Surface) -> None:
+
+        self.surface = surface
+        self.sim_rect = pygame.Rect(0, 0, sim_width, height)
+        self.ui_rect = pygame.Rect(sim_width, 0, ui_width, height)
+        self.ui_layer = pygame.Surface((width, height))
+        self.ui_key = None
+        self.prev_rects = []
+        self.dirty = []
+        self.full_redraw = True
+
+    def invalidate(self) -> None:
+        """Forces the next frame to redraw and push the whole window."""
+
+        self.full_redraw = True
+
+    def draw(self, status: str=None, overlay=None) -> None:
+        """Draws a frame, with overlay(surface) -> Rect drawn over the simulation area if given."""
+
+        dirty = []
+        if self.full_redraw:
+            self.surface.fill(BG_COLOUR, self.sim_rect)
+        else:
+            for rect in self.prev_rects:
+                self.surface.fill(BG_COLOUR, rect)
+            dirty.extend(self.prev_rects)
+
+        # bobs swinging past sim_width are clipped so they never dirty the UI panel
+        self.surface.set_clip(self.sim_rect)
+        drawn = [ptc.draw_line(self.surface).inflate(2, 2) for ptc in particles]
+        drawn += [ptc.draw_particle(self.surface).inflate(2, 2) for ptc in particles]
+        if overlay:
+            drawn.append(overlay(self.surface))
+        self.surface.set_clip(None)
+        self.prev_rects = [rect.clip(self.sim_rect) for rect in drawn]
+        dirty.extend(self.prev_rects)
+
+        ui_key = (status, tuple((slider_id, slider.value, slider.slider.center)
+                                for slider_id, slider in sliders.items()))
+        if self.full_redraw or ui_key != self.ui_key:
+            draw_ui(self.ui_layer, status)
+            self.surface.blit(self.ui_layer, self.ui_rect, area=self.ui_rect)
+            self.ui_key = ui_key
+            dirty.append(self.ui_rect)
+        self.dirty = dirty
+
+    def present(self) -> None:
+        """Pushes the area changed by the last draw() to the display."""
+
+        if self.full_redraw:
+            pygame.display.update()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.dirty)
+
+def setup() -> None:
+    """
+    Initializes pygame, opens the window and builds the sliders, particles, chain and
+    renderer. Called once when the app is launched; calling it again does nothing.
+    """
+
+    global win, clock, chain, renderer
+
+    if win is not None:
+        return
+
+    pygame.init()
+    win = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("pendulum motion")
+    clock = pygame.time.Clock()
+
+    mass1 = new_slider("Mass 1:", (text_margin + sim_width + ui_width // 2, 100), 1, 40)
+    radius1 = new_slider("Radius 1:", (text_margin + sim_width + ui_width // 2, 150), 1, 4)
+    radius1.value = 2
+    mass2 = new_slider("Mass 2:", (text_margin + sim_width + ui_width // 2, 200), 1, 40)
+    radius2 = new_slider("Radius 2:", (text_margin + sim_width + ui_width // 2, 250), 1, 4)
+
+    Particle(mass1, radius1, particles, 0.1)
+    Particle(mass2, radius2, particles, 0.9)
+
+    chain = physics.Chain([ptc.angle for ptc in particles],
+                          [ptc.mass for ptc in particles],
+                          [ptc.radius * 100 for ptc in particles], g=g, method=physics_method)
+
+    renderer = Renderer(win)
+
+def app_state(base_pivot: np.ndarray) -> dict:
+    """
+    Returns the UI state a checkpoint needs besides the chain: slider values and knobs, and
+    the pivot as placed with the arrow keys, without the offset of any drive.
+    """
+
+    return {'sliders': {slider_id: [slider.value, slider.slider.centerx] for slider_id, slider in sliders.items()},
+            'base_pivot': [float(x) for x in base_pivot]}
+
+def resume(path: str) -> dict:
+    """
+    Replaces the chain and UI state with a checkpoint and returns its extra state. The pivot
+    is set to the saved base pivot; callers with a drive add its offset again.
+    """
+
+    global chain
+
+    restored, _, extra = checkpoint.load(path)
+    if restored.angles.shape != chain.angles.shape:
+        raise SystemExit(f"{path} holds a {restored.angles.shape} chain, the app draws {chain.angles.shape}")
+    chain = restored
+    for slider_id, (value, knob_x) in extra['sliders'].items():
+        if slider_id in sliders:
+            sliders[slider_id].value = value
+            sliders[slider_id].slider.centerx = knob_x
+    # checkpoints from before drives existed only hold the drawn pivot, which was the base one then
+    particles[0].pivot = tuple(extra.get('base_pivot', extra.get('pivot')))
+    for ptc, angle in zip(particles, chain.angles):
+        ptc.angle = angle
+        ptc.update()
+    return extra
+
+def draw_surface(status: str=None) -> None:
+
+    renderer.draw(status)
+    renderer.present()
+
+def main(record_path: str=None, profile_path: str=None, stats_path: str=None,
+         checkpoint_path: str=None, resume_path: str=None, drive: forcing.ForcingTable=None,
+         worker: bool=False) -> None:
+    """
+    Runs the interactive simulation.
+
+    F3 toggles the profiler overlay, which shows p50/p99 milliseconds per frame phase over
+    the last 600 frames. F4 writes those frames to PROFILE.csv and PROFILE.json, where
+    PROFILE is profile_path or 'profile'; with profile_path they are also written on exit.
+
+    With stats_path, rolling statistics are appended to it every stats_interval simulated
+    seconds instead of keeping any history.
+
+    With checkpoint_path, the full state is checkpointed every checkpoint_interval seconds
+    of wall-clock time in the background, and F5 checkpoints immediately. resume_path starts
+    from a checkpoint, continuing the trajectory exactly where it was saved.
+
+    The arrow keys move the pivot, and its acceleration is fed to the physics, so jerking
+    the pivot swings the chain. drive is a forcing table that shakes the pivot on top of that.
+
+    With worker, the chain is stepped by a SimulationWorker process and each frame only reads
+    its latest published state, so the window and sliders stay at max_fps however slow the
+    physics gets. Recording, statistics and checkpoints then happen in the worker. Input
+    reaches the physics whenever the worker next drains its queue instead of at a fixed
+    step, so a recording made this way cannot be reproduced from the same input.
+    """
+
+    accumulator = 0.0
+    if resume_path:
+        accumulator = resume(resume_path).get('accumulator', 0.0)
+    # the pivot moved by the arrow keys; the drawn one is this plus the drive's offset
+    base_pivot = np.array(particles[0].pivot, dtype=float)
+
+    simulation = recorder = stats = checkpointer = None
+    if worker:
+        chain.forcing = drive
+        simulation = SimulationWorker(chain, physics_dt, max_frame_time, record_path,
+                                      {'pivot': base_pivot.tolist()}, stats_path,
+                                      stats_sample_every, stats_interval, checkpoint_path)
+    else:
+        if record_path:
+            recorder = TrajectoryRecorder.from_chain(record_path, chain, dt=physics_dt,
+                                                     params={'pivot': base_pivot})
+        if stats_path:
+            stats = OnlineStats(chain, stats_sample_every, stats_interval, stats_path)
+        if checkpoint_path:
+            checkpointer = Checkpointer(checkpoint_path)
+    last_checkpoint = pygame.time.get_ticks()
+    # the parameters last sent to the worker, which only gets changes
+    sent = {}
+
+    def report_checkpoint_error(error: Exception) -> None:
+        # the run goes on, a later checkpoint may still succeed, e.g. once the disk has room
+        print(f"checkpoint to {checkpoint_path} failed: {error}", file=sys.stderr)
+
+    def save_checkpoint() -> None:
+        if simulation:
+            simulation.checkpoint(**app_state(base_pivot))
+        else:
+            try:
+                checkpointer.save(chain, accumulator=accumulator, **app_state(base_pivot))
+            except Exception as error:
+                report_checkpoint_error(error)
+
+    def nudge(delta: float) -> None:
+        if simulation:
+            shift = np.zeros(len(particles))
+            shift[-1] = delta
+            simulation.nudge(shift)
+        else:
+            chain.angles[-1] += delta
+
+    prev_angles = chain.angles.copy()
+    prev_base_pivot = base_pivot.copy()
+    pivot_vel = np.zeros(2)
+    pivot_forcing = drive or forcing.constant()
+    window_visible = True
+    profiler = PhaseProfiler(profile_phases)
+    profiler.enabled = profile_path is not None
+    profile_prefix = profile_path or 'profile'
+
+    def export_profile() -> None:
+        profiler.export_csv(profile_prefix + '.csv')
+        profiler.export_json(profile_prefix + '.json')
+
+    def overlay(surface: pygame.Surface) -> pygame.Rect:
+        return profiler.draw(surface, (10, 10))
 
-def main() -> None:
-    
     while True:
         
         pygame.display.set_caption(f"pendulum motion    fps: {int(clock.get_fps())}")
-        clock.tick(max_fps)
+        # only rendering is throttled while hidden, the accumulator keeps physics on schedule
+        frame_time = clock.tick(max_fps if window_visible else hidden_fps) / 1000
+        # waiting in tick() is idle time, so each frame is timed from after it
+        profiler.start_frame()
         
         keys = pygame.key.get_pressed()
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
+                # the window closes even if saving something fails
+                try:
+                    if simulation:
+                        simulation.stop(**app_state(base_pivot))
+                    if recorder:
+                        recorder.close()
+                    if stats:
+                        stats.close()
+                    if checkpointer:
+                        save_checkpoint()
+                        try:
+                            checkpointer.close()
+                        except Exception as error:
+                            report_checkpoint_error(error)
+                    if profile_path:
+                        export_profile()
+                finally:
+                    pygame.quit()
                 quit()
+            if event.type in (pygame.WINDOWHIDDEN, pygame.WINDOWMINIMIZED):
+                window_visible = False
+            if event.type in (pygame.WINDOWSHOWN, pygame.WINDOWRESTORED, pygame.WINDOWEXPOSED):
+                window_visible = True
+                renderer.invalidate()
             if event.type == pygame.KEYDOWN:
                 
                 if pygame.key.get_pressed()[pygame.K_EQUALS]:
-                    particles[-1].angle += 0.1
+                    nudge(0.1)
                 if pygame.key.get_pressed()[pygame.K_MINUS]:
-                    particles[-1].angle -= 0.1
+                    nudge(-0.1)
+
+                if event.key == pygame.K_F3:
+                    profiler.enabled = not profiler.enabled
+                if event.key == pygame.K_F4:
+                    export_profile()
+                if event.key == pygame.K_F5 and checkpoint_path:
+                    save_checkpoint()
 
                 if event.key==pygame.K_r:
-                    p1.angle=1.5707963
-                    p2.angle=1.5707963
-                    p1.acc=0
-                    p2.acc=0
+                    if simulation:
+                        simulation.set(angles=1.5707963, angular_vels=0)
+                    else:
+                        chain.angles[:] = 1.5707963
+                        chain.angular_vels[:] = 0
+                        prev_angles[:] = chain.angles
         
-        if particles:
-            ptc = particles[0]
-            diff = 2
-            if keys[pygame.K_RIGHT]:
-                ptc.pivot = (ptc.pivot[0] + diff, ptc.pivot[1])
-            if keys[pygame.K_LEFT]:
-                ptc.pivot = (ptc.pivot[0] - diff, ptc.pivot[1])
-            if keys[pygame.K_UP]:
-                ptc.pivot = (ptc.pivot[0], ptc.pivot[1] - diff)
-            if keys[pygame.K_DOWN]:
-                ptc.pivot = (ptc.pivot[0], ptc.pivot[1] + diff)
+        diff = 2
+        if keys[pygame.K_RIGHT]:
+            base_pivot[0] += diff
+        if keys[pygame.K_LEFT]:
+            base_pivot[0] -= diff
+        if keys[pygame.K_UP]:
+            base_pivot[1] -= diff
+        if keys[pygame.K_DOWN]:
+            base_pivot[1] += diff
+        profiler.mark('events')
 
-        
-        p1 = particles[0]
-        p2 = particles[1]
-        
-        p2.tension = (p2.mass*g) / cos(p2.angle)
-        p1.tension = (p2.tension*cos(p2.angle) + p1.mass*g) / cos(p1.angle)
-        
-        p1.acc = ((-p1.tension*sin(p1.angle) + p2.tension*sin(p2.angle))**2 + (p1.tension*cos(p1.angle)-p1.tension*cos(p2.angle) - p1.mass*g)**2) ** 0.5 / p1.mass
-        p2.acc = ((p2.tension*sin(p2.angle))**2) + ((p2.tension*cos(p2.angle) - p2.mass*g)**2)**0.5 / p2.mass
-
-        decreaseConstant=0.00001
-        #Update the  new angle into...
-        if p1.pivot[0] 
-        p1.angular_vel+=p1.acc*decreaseConstant
-        p1.angle+=p1.angular_vel*decreaseConstant
-        
-        p2.angular_vel+=p2.acc*decreaseConstant
-        p2.angle+=p2.angular_vel*decreaseConstant
+        # the pivot acceleration over the last frame acts on every substep of this one
+        if frame_time > 0:
+            vel = (base_pivot - prev_base_pivot) / frame_time
+            pivot_forcing.bias[:] = (vel - pivot_vel) / frame_time
+            pivot_vel = vel
+        prev_base_pivot[:] = base_pivot
+        masses = [ptc.mass for ptc in particles]
+        lengths = [ptc.radius * 100 for ptc in particles]
+
+        if simulation:
+            if not simulation.is_alive():
+                # stop() frees the shared block and raises the worker's failure, if it had one
+                try:
+                    simulation.stop()
+                finally:
+                    pygame.quit()
+                raise SystemExit("the simulation worker stopped")
+            params = {'masses': masses, 'lengths': lengths, 'bias': pivot_forcing.bias.tolist(),
+                      'pivot': base_pivot.tolist()}
+            changed = {name: value for name, value in params.items() if sent.get(name) != value}
+            if changed:
+                simulation.set(**changed)
+                sent.update(changed)
+
+            # the worker publishes every physics step, so the latest state needs no interpolation
+            t, angles, _ = simulation.read()
+            for ptc, angle in zip(particles, angles):
+                ptc.angle = angle
+        else:
+            chain.forcing = pivot_forcing if drive or pivot_forcing.bias.any() else None
+            chain.masses[:] = masses
+            chain.lengths[:] = lengths
+            if recorder:
+                recorder.set_params(masses=masses, lengths=lengths, pivot=base_pivot)
+
+            # fixed timestep: a stalled frame is caught up with more substeps (capped so a long
+            # stall cannot spiral), and the trajectory never depends on the frame rate
+            accumulator += min(frame_time, max_frame_time)
+            while accumulator >= physics_dt:
+                prev_angles[:] = chain.angles
+                chain.step(physics_dt)
+                accumulator -= physics_dt
+                if recorder:
+                    recorder.record_chain(chain)
+                if stats:
+                    stats.observe(chain)
+
+            # draw the state part way between the last two physics steps
+            alpha = accumulator / physics_dt
+            for ptc, prev_angle, angle in zip(particles, prev_angles, chain.angles):
+                ptc.angle = prev_angle + alpha * (angle - prev_angle)
+            t = chain.t
+        particles[0].pivot = tuple(base_pivot + pivot_forcing.offset(t))
+        if checkpoint_path and pygame.time.get_ticks() - last_checkpoint >= checkpoint_interval * 1000:
+            save_checkpoint()
+            last_checkpoint = pygame.time.get_ticks()
+        profiler.mark('physics')
 
-        # p1.angular_vel = (p1.tension*cos(p1.angle) - p2.tension*cos(p2.angle) - p1.mass*g) / p1.mass*p1.radius*sin(p1.angle)
-        # p2.angular_vel = (p2.tension*cos(p2.angle) - p2.mass*g) / p2.mass*p2.radius*sin(p2.angle)
-        
-        
         for slider_id in sliders:
             sliders[slider_id].update()
+        profiler.mark('sliders')
             
         for ptc in particles:
             ptc.update()
+        profiler.mark('particles')
+
+        if window_visible:
+            renderer.draw(overlay=overlay if profiler.enabled else None)
+            profiler.mark('draw')
+            renderer.present()
+            profiler.mark('display')
+        profiler.end_frame()
+
+def export_video(path: str, duration: float, fps: float=60.0, scale: float=1.0,
+                 drive: forcing.ForcingTable=None, n_systems: int=None, n_scene: int=None,
+                 mode: str='trails') -> None:
+    """
+    Renders duration simulated seconds of the app to a video file or PNG directory offline.
+
+    Every frame shows the simulation at exactly frame / fps simulated seconds, however long
+    it takes to draw and encode, so nothing is dropped and the export runs as fast as the
+    machine allows rather than in real time. Frames are drawn like the interactive views
+    onto an offscreen surface, smoothscaled by scale (3.5 gives 3850x2100, about 4K) and
+    handed to a bounded FramePipeline. The physics step is shortened to the largest step at
+    or below the view's rate that divides the frame interval.
+
+    By default the chain is exported; with n_systems an ensemble drawn like ensemble_view()
+    in mode, with n_scene the colliding pendulums of scene_view(). drive shakes the pivot of
+    the chain and the ensemble, scenes are never driven.
+
+    Only part of the work scales across cores: PNG encoding runs on several writer threads,
+    ffmpeg encodes on its own threads, and an ensemble with the numba backend steps its
+    systems in parallel. Stepping and drawing each frame stay on the calling thread, so a
+    large scene, whose collisions and per-bob drawing are single threaded, exports at the
+    speed of one core.
+    """
+
+    out_size = (2 * round(width * scale / 2), 2 * round(height * scale / 2))
+    frame_surface = pygame.Surface((width, height))
+    scaled_surface = pygame.Surface(out_size) if out_size != (width, height) else None
+    base_pivot = np.array(particles[0].pivot, dtype=float)
+    chain.forcing = drive
+
+    if n_scene:
+        system, pivots, radii = new_scene(n_scene, np.random.default_rng(0))
+        rate = physics_rate
+
+        def draw() -> None:
+            draw_scene(frame_surface, system, pivots, radii)
+
+    elif n_systems:
+        system = new_ensemble(n_systems)
+        bulk = BulkRenderer((sim_width, height), mode, colour=PARTICLE_COLOUR, bg=BG_COLOUR)
+        rate = ensemble_rate
+
+        def draw() -> None:
+            pivot = base_pivot + drive.offset(system.t) if drive else base_pivot
+            draw_ensemble(frame_surface, bulk, system, system.angles, pivot)
+
+    else:
+        system = chain
+        offscreen = Renderer(frame_surface)
+        rate = physics_rate
+
+        def draw() -> None:
+            for ptc, angle in zip(particles, chain.angles):
+                ptc.angle = angle
+            if drive:
+                particles[0].pivot = tuple(base_pivot + drive.offset(chain.t))
+            for ptc in particles:
+                ptc.update()
+            offscreen.draw()
+
+    substeps = ceil(rate / fps)
+    dt = 1 / (fps * substeps)
+    n_frames = int(round(duration * fps))
+    start = time.perf_counter()
+    with FramePipeline(open_writer(path, out_size, fps)) as pipeline:
+        for frame in range(n_frames):
+            if frame:
+                system.run(dt, substeps)
+            draw()
+            image = frame_surface
+            if scaled_surface:
+                pygame.transform.smoothscale(frame_surface, out_size, scaled_surface)
+                image = scaled_surface
+            pipeline.submit(pygame.image.tobytes(image, 'RGB'))
+
+            if frame % max(1, round(fps)) == 0:
+                print(f"frame {frame}/{n_frames}", end='\r')
+
+    elapsed = time.perf_counter() - start
+    print(f"{n_frames} frames of {out_size[0]}x{out_size[1]} written to {path} in {elapsed:.1f}s, "
+          f"x{duration / elapsed:.2f} real time")
+
+def replay(path: str) -> None:
+    """
+    Plays a recording made with --record in the window without re-simulating it.
+
+    Controls: space plays/pauses, up/down change speed (x0.1 to x100), left/right seek by
+    one second of simulated time, home restarts, and the Time slider scrubs.
+
+    Every frame is drawn with the masses, lengths and pivot recorded for it, so slider and
+    pivot changes made during the recording replay as they happened. A drive's offset is
+    not recorded and not drawn.
+    """
+
+    playback = Playback(path)
+    shape = playback.reader.state_shape
+    if shape[-1] != len(particles):
+        raise SystemExit(f"{path} holds {shape[-1]}-link chains, the app draws {len(particles)}")
+
+    sliders.clear()
+    timeline = new_slider("Time:", (text_margin + sim_width + ui_width // 2, 100), 0, playback.duration)
+    renderer.invalidate()
+
+    while True:
+
+        pygame.display.set_caption(f"pendulum motion    replay    fps: {int(clock.get_fps())}")
+        real_dt = clock.tick(max_fps) / 1000
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                quit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    playback.toggle()
+                if event.key == pygame.K_UP:
+                    playback.faster()
+                if event.key == pygame.K_DOWN:
+                    playback.slower()
+                if event.key == pygame.K_RIGHT:
+                    playback.seek(playback.t + 1)
+                if event.key == pygame.K_LEFT:
+                    playback.seek(playback.t - 1)
+                if event.key == pygame.K_HOME:
+                    playback.seek(playback.t_start)
+                    playback.playing = True
+
+        timeline.update()
+        if timeline.moving:
+            playback.seek(playback.t_start + timeline.value)
+        else:
+            playback.update(real_dt)
+            fraction = (playback.t - playback.t_start) / playback.duration if playback.duration else 0
+            timeline.slider.centerx = timeline.bar.left + fraction * timeline.bar.width
+            timeline.value = round(playback.t - playback.t_start, 2)
+
+        angles, _ = playback.state()
+        # ensemble recordings are drawn through their first system; older recordings hold
+        # their parameters, fixed for the whole run, in the header metadata
+        params = playback.params() or playback.reader.meta
+        angles = np.reshape(angles, (-1, shape[-1]))[0]
+        lengths = np.reshape(params['lengths'], (-1, shape[-1]))[0]
+        masses = np.reshape(params['masses'], (-1, shape[-1]))[0]
+        pivot = tuple(params['pivot']) if 'pivot' in params else particles[0].pivot
+        centers = physics.positions(angles, lengths, pivot)
+        for ptc, center, mass in zip(particles, centers, masses):
+            ptc.pivot = pivot if ptc.first else ptc.particles[ptc.index - 1].center
+            ptc.center = tuple(center)
+            ptc.mass = mass
+
+        state = "playing" if playback.playing else "paused"
+        draw_surface(f"{state}  x{playback.speed:g}  t={playback.t:.2f}s")
+
+def new_ensemble(n_systems: int) -> Ensemble:
+    """Returns n_systems copies of the chain with slightly perturbed angles."""
+
+    return Ensemble.from_chain(chain, n_systems, angle_spread=1e-3, seed=0)
+
+def draw_ensemble(surface: pygame.Surface, bulk: BulkRenderer, ensemble: Ensemble, angles: np.ndarray,
+                  pivot: tuple, t: float=None) -> None:
+    """Fades bulk, plots the tips of the chains at angles hanging from pivot and draws it all onto surface."""
+
+    tips = physics.positions(angles, ensemble.lengths, pivot)[:, -1]
+    bulk.fade()
+    bulk.plot(tips)
+    bulk.draw(surface)
+    draw_ui(surface, f"{bulk.mode}  t={ensemble.t if t is None else t:.2f}s")
+
+def ensemble_view(n_systems: int, mode: str='trails', worker: bool=False) -> None:
+    """
+    Simulates n_systems copies of the chain with slightly perturbed angles and draws every
+    tip through a BulkRenderer. H switches between trails and heatmap, C clears the buffer.
+    With worker, the ensemble is stepped in a SimulationWorker process, like main().
+    """
+
+    ensemble = new_ensemble(n_systems)
+    bulk = BulkRenderer((sim_width, height), mode, colour=PARTICLE_COLOUR, bg=BG_COLOUR)
+    pivot = particles[0].pivot
+    ensemble_dt = 1 / ensemble_rate
+    accumulator = 0.0
+    simulation = SimulationWorker(ensemble, ensemble_dt, max_frame_time) if worker else None
+
+    while True:
+
+        pygame.display.set_caption(f"pendulum motion    {n_systems} pendulums    fps: {int(clock.get_fps())}")
+        accumulator += min(clock.tick(max_fps) / 1000, max_frame_time)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                try:
+                    if simulation:
+                        simulation.stop()
+                finally:
+                    pygame.quit()
+                quit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_h:
+                    bulk.set_mode('heatmap' if bulk.mode == 'trails' else 'trails')
+                if event.key == pygame.K_c:
+                    bulk.clear()
+
+        if simulation:
+            t, angles, _ = simulation.read()
+        else:
+            n_steps = int(accumulator / ensemble_dt)
+            if n_steps:
+                ensemble.run(ensemble_dt, n_steps)
+                accumulator -= n_steps * ensemble_dt
+            t, angles = ensemble.t, ensemble.angles
+
+        draw_ensemble(win, bulk, ensemble, angles, pivot, t)
+        pygame.display.update()
+
+def scene_angles(n_systems: int, rng: np.random.Generator) -> np.ndarray:
+    """Returns start angles for n_systems copies of the chain, each perturbed by up to 0.5 rad."""
+
+    return chain.angles + rng.uniform(-0.5, 0.5, (n_systems, chain.n_links))
+
+def new_scene(n_systems: int, rng: np.random.Generator) -> tuple:
+    """
+    Hangs n_systems copies of the chain side by side along the top of the simulation area
+    and returns the collisions.Scene, its pivots and the radius of every bob.
+    """
+
+    spacing = sim_width / (n_systems + 1)
+    pivots = np.stack((spacing * np.arange(1, n_systems + 1), np.full(n_systems, particles[0].pivot[1])), axis=-1)
+    scene = collisions.Scene(pivots, scene_angles(n_systems, rng), chain.masses, chain.lengths,
+                             g=g, method=physics_method)
+    return scene, pivots, collisions.bob_radii(scene.ensemble.masses)
+
+def draw_scene(surface: pygame.Surface, scene: collisions.Scene, pivots: np.ndarray, radii: np.ndarray) -> None:
+
+    surface.fill(BG_COLOUR, (0, 0, sim_width, height))
+    for pivot, bobs, bob_radii in zip(pivots, scene.positions(), radii):
+        pygame.draw.lines(surface, (0, 0, 0), False, [pivot, *bobs], width=2)
+        for bob, radius in zip(bobs, bob_radii):
+            pygame.draw.circle(surface, PARTICLE_COLOUR, bob, radius)
+    draw_ui(surface, f"{scene.n_contacts} contacts  t={scene.t:.2f}s")
+
+def scene_view(n_systems: int) -> None:
+    """
+    Hangs n_systems copies of the chain side by side along the top of the simulation area,
+    started at slightly different angles, and lets their bobs collide. R restarts them.
+    """
+
+    rng = np.random.default_rng(0)
+    scene, pivots, radii = new_scene(n_systems, rng)
+    accumulator = 0.0
+
+    while True:
+
+        pygame.display.set_caption(f"pendulum motion    {n_systems} colliding pendulums    fps: {int(clock.get_fps())}")
+        accumulator += min(clock.tick(max_fps) / 1000, max_frame_time)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                quit()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                scene.ensemble.angles[:] = scene_angles(n_systems, rng)
+                scene.ensemble.angular_vels[:] = 0
+
+        while accumulator >= physics_dt:
+            scene.step(physics_dt)
+            accumulator -= physics_dt
 
-        draw_surface()
+        draw_scene(win, scene, pivots, radii)
+        pygame.display.update()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Interactive pendulum simulation.")
+    parser.add_argument('--record', metavar='PATH', help="stream every physics step to a recording directory")
+    parser.add_argument('--replay', metavar='PATH', help="play back a recording instead of simulating")
+    parser.add_argument('--ensemble', metavar='N', type=int, help="simulate N perturbed copies and draw them in bulk")
+    parser.add_argument('--scene', metavar='N', type=int, help="hang N copies of the chain side by side with colliding bobs")
+    parser.add_argument('--heatmap', action='store_true', help="start the ensemble view in heatmap mode")
+    parser.add_argument('--stats', metavar='PATH', help="append rolling statistics snapshots to a JSON lines file")
+    parser.add_argument('--checkpoint', metavar='PATH', help="checkpoint the full state to PATH every few seconds and on exit")
+    parser.add_argument('--resume', metavar='PATH', help="start from a checkpoint")
+    parser.add_argument('--drive', choices=('harmonic', 'kapitza'),
+                        help="shake the pivot, horizontally (harmonic) or vertically (kapitza)")
+    parser.add_argument('--drive-amplitude', type=float, default=10.0, help="pivot amplitude in pixels")
+    parser.add_argument('--drive-frequency', type=float, default=50.0, help="pivot frequency in Hz")
+    parser.add_argument('--export', metavar='PATH',
+                        help="render offline to a video file (.mp4 etc., needs ffmpeg) or a PNG directory, "
+                             "the --ensemble or --scene view if given")
+    parser.add_argument('--duration', type=float, default=10.0, help="simulated seconds to export")
+    parser.add_argument('--fps', type=float, default=60.0, help="export frame rate")
+    parser.add_argument('--scale', type=float, default=1.0, help="export resolution as a multiple of the window")
+    parser.add_argument('--worker', action='store_true',
+                        help="step the physics in a separate process, so the window stays responsive however heavy it is")
+    parser.add_argument('--profile', metavar='PREFIX', help="show the profiler overlay and write PREFIX.csv/.json on exit")
+    args = parser.parse_args()
+    if args.export:
+        # exports never show the window, so they also run on machines without a display
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    setup()
+    drive = None
+    if args.drive == 'harmonic':
+        drive = forcing.harmonic(args.drive_amplitude, args.drive_frequency, (1.0, 0.0))
+    elif args.drive == 'kapitza':
+        drive = forcing.kapitza(args.drive_amplitude, args.drive_frequency)
+    if args.export:
+        if args.resume:
+            resume(args.resume)
+        export_video(args.export, args.duration, args.fps, args.scale, drive, args.ensemble, args.scene,
+                     'heatmap' if args.heatmap else 'trails')
+    elif args.replay:
+        replay(args.replay)
+    elif args.ensemble:
+        ensemble_view(args.ensemble, 'heatmap' if args.heatmap else 'trails', args.worker)
+    elif args.scene:
+        scene_view(args.scene)
+    else:
+        main(record_path=args.record, profile_path=args.profile, stats_path=args.stats,
+             checkpoint_path=args.checkpoint, resume_path=args.resume, drive=drive, worker=args.worker)
\ No newline at end of file
@@ -0,0 +1,425 @@
+"""
+A module containing a headless integrator for N-link pendulum chains.
+
+This module has no dependency on pygame and can be imported and run without a display.
+The compiled kernels, and with them numba, are only imported when a Chain first selects the
+numba backend, so importing physics costs little more than importing NumPy.
+Chain state is held in NumPy arrays and advanced with the Lagrangian equations of motion
+of a chain of point masses on massless rigid rods.
+
+Angles follow the convention of the pygame app: they are measured from the +x axis with
+y pointing down the screen, so a bob hanging at rest has an angle of pi / 2. Lengths are
+in pixels and g in pixels per second squared.
+
+Every function accepts arrays with arbitrary leading batch dimensions, e.g. angles of
+shape (n_links,) for a single chain or (n_systems, n_links) for many independent chains.
+
+The pivot may be driven: given its acceleration A = (A_x, A_y), the chain moves as in a
+frame attached to the pivot, where every bob feels the extra force -m A. Gravity and this
+pseudo force together give link j the generalized force mu_j l_j ((g - A_y) cos a_j + A_x sin a_j).
+
+Functions:
+    mass_matrix(angles: np.ndarray, masses: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        Returns the configuration-dependent mass matrix of the chain.
+    accelerations(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                  lengths: np.ndarray, g: float=G, pivot_acc: np.ndarray=None) -> np.ndarray:
+        Solves the equations of motion for the angular accelerations.
+    total_energy(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                 lengths: np.ndarray, g: float=G) -> np.ndarray:
+        Returns the kinetic plus potential energy of the chain.
+    positions(angles: np.ndarray, lengths: np.ndarray, pivot: tuple=(0, 0)) -> np.ndarray:
+        Returns the cartesian position of every bob.
+    momenta(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+            lengths: np.ndarray) -> np.ndarray:
+        Returns the canonical momenta conjugate to the link angles.
+    velocities(angles: np.ndarray, momenta: np.ndarray, masses: np.ndarray,
+               lengths: np.ndarray) -> np.ndarray:
+        Returns the angular velocities that correspond to canonical momenta.
+    momentum_rates(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                   lengths: np.ndarray, g: float=G, pivot_acc: np.ndarray=None) -> np.ndarray:
+        Returns the time derivative of the canonical momenta.
+
+Classes:
+    Chain:
+        Represents a single N-link pendulum chain.
+
+        Methods:
+            __init__(angles, masses, lengths, angular_vels=None, g: float=G,
+                     method: str='rk4', backend: str='auto', forcing: ForcingTable=None) -> None:
+                Initializes a new Chain object.
+            derivatives(angles: np.ndarray, angular_vels: np.ndarray, t: float) -> tuple:
+                Returns the time derivatives of the angles and angular velocities.
+            step(dt: float) -> None:
+                Advances the chain by one time step with the selected integrator.
+            run(dt: float, n_steps: int) -> None:
+                Advances the chain by n_steps time steps.
+            energy() -> float:
+                Returns the total energy of the chain.
+            positions(pivot: tuple=(0, 0)) -> np.ndarray:
+                Returns the cartesian position of every bob.
+"""
+
+import numpy as np
+
+import integrators
+
+G = 980.7
+
+
+def _suffix_sums(masses: np.ndarray) -> np.ndarray:
+    """Returns mu_j, the total mass hanging from link j (the sum of masses[j:])."""
+
+    return np.flip(np.cumsum(np.flip(masses, axis=-1), axis=-1), axis=-1)
+
+
+def _coupled_masses(masses: np.ndarray) -> np.ndarray:
+    """Returns mu_max(j, k), the mass hanging below both link j and link k."""
+
+    n_links = masses.shape[-1]
+    idx = np.arange(n_links)
+    return _suffix_sums(masses)[..., np.maximum.outer(idx, idx)]
+
+
+def mass_matrix(angles: np.ndarray, masses: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Returns the configuration-dependent mass matrix of the chain.
+
+    Args:
+        angles (np.ndarray): Link angles of shape (..., n_links).
+        masses (np.ndarray): Bob masses, broadcastable to angles.
+        lengths (np.ndarray): Rod lengths, broadcastable to angles.
+
+    Returns:
+        np.ndarray: The matrix M_jk = mu_max(j, k) * l_j * l_k * cos(a_j - a_k),
+            of shape (..., n_links, n_links).
+    """
+
+    angles, masses, lengths = np.broadcast_arrays(angles, masses, lengths)
+    diff = angles[..., :, None] - angles[..., None, :]
+    return _coupled_masses(masses) * lengths[..., :, None] * lengths[..., None, :] * np.cos(diff)
+
+
+def _gravity(angles: np.ndarray, g: float, pivot_acc: np.ndarray) -> np.ndarray:
+    """Returns (g - A_y) cos a_j + A_x sin a_j for every link, g cos a_j when the pivot is fixed."""
+
+    if pivot_acc is None:
+        return g * np.cos(angles)
+    pivot_acc = np.asarray(pivot_acc, dtype=float)
+    return (g - pivot_acc[..., 1:]) * np.cos(angles) + pivot_acc[..., :1] * np.sin(angles)
+
+
+def accelerations(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                  lengths: np.ndarray, g: float=G, pivot_acc: np.ndarray=None) -> np.ndarray:
+    """
+    Solves the equations of motion for the angular accelerations.
+
+    Row j of the Lagrangian system is divided through by l_j, which keeps the linear
+    solve well conditioned when link lengths differ by orders of magnitude.
+
+    Args:
+        angles (np.ndarray): Link angles of shape (..., n_links).
+        angular_vels (np.ndarray): Angular velocities, same shape as angles.
+        masses (np.ndarray): Bob masses, broadcastable to angles.
+        lengths (np.ndarray): Rod lengths, broadcastable to angles.
+        g (float): Gravitational acceleration. Default is G.
+        pivot_acc (np.ndarray): The (A_x, A_y) acceleration of the pivot, of shape (..., 2)
+            broadcastable to the batch shape. Default is None, a fixed pivot.
+
+    Returns:
+        np.ndarray: The angular accelerations, same shape as angles.
+    """
+
+    angles, angular_vels, masses, lengths = np.broadcast_arrays(angles, angular_vels, masses, lengths)
+    if angles.shape[-1] == 2:
+        return _accelerations_2link(angles, angular_vels, masses, lengths, g, pivot_acc)
+
+    diff = angles[..., :, None] - angles[..., None, :]
+    coupled = _coupled_masses(masses) * lengths[..., None, :]
+
+    lhs = coupled * np.cos(diff)
+    rhs = (_suffix_sums(masses) * _gravity(angles, g, pivot_acc)
+           - np.sum(coupled * np.sin(diff) * angular_vels[..., None, :] ** 2, axis=-1))
+
+    return np.linalg.solve(lhs, rhs[..., None])[..., 0]
+
+
+def _accelerations_2link(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                         lengths: np.ndarray, g: float, pivot_acc: np.ndarray=None) -> np.ndarray:
+    """Closed-form solution of the double pendulum, which skips building and solving the 2x2 systems."""
+
+    a0, a1 = angles[..., 0], angles[..., 1]
+    w0, w1 = angular_vels[..., 0], angular_vels[..., 1]
+    m1 = masses[..., 1]
+    mu0 = masses[..., 0] + m1
+    l0, l1 = lengths[..., 0], lengths[..., 1]
+
+    gravity = _gravity(angles, g, pivot_acc)
+    s, c = np.sin(a0 - a1), np.cos(a0 - a1)
+    r0 = mu0 * gravity[..., 0] - m1 * l1 * s * w1 ** 2
+    r1 = gravity[..., 1] + l0 * s * w0 ** 2
+    det = mu0 - m1 * c ** 2
+
+    out = np.empty(angles.shape)
+    out[..., 0] = (r0 - m1 * c * r1) / (l0 * det)
+    out[..., 1] = (mu0 * r1 - c * r0) / (l1 * det)
+    return out
+
+
+def total_energy(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                 lengths: np.ndarray, g: float=G) -> np.ndarray:
+    """
+    Returns the kinetic plus potential energy of the chain.
+
+    Args:
+        angles (np.ndarray): Link angles of shape (..., n_links).
+        angular_vels (np.ndarray): Angular velocities, same shape as angles.
+        masses (np.ndarray): Bob masses, broadcastable to angles.
+        lengths (np.ndarray): Rod lengths, broadcastable to angles.
+        g (float): Gravitational acceleration. Default is G.
+
+    Returns:
+        np.ndarray: The total energy, with the batch shape of angles.
+    """
+
+    angles, angular_vels, masses, lengths = np.broadcast_arrays(angles, angular_vels, masses, lengths)
+    matrix = mass_matrix(angles, masses, lengths)
+    kinetic = 0.5 * np.einsum('...j,...jk,...k->...', angular_vels, matrix, angular_vels)
+    potential = -g * np.sum(_suffix_sums(masses) * lengths * np.sin(angles), axis=-1)
+    return kinetic + potential
+
+
+def positions(angles: np.ndarray, lengths: np.ndarray, pivot: tuple=(0, 0)) -> np.ndarray:
+    """
+    Returns the cartesian position of every bob.
+
+    Args:
+        angles (np.ndarray): Link angles of shape (..., n_links).
+        lengths (np.ndarray): Rod lengths, broadcastable to angles.
+        pivot (tuple): The position of the top of the chain. Default is (0, 0).
+
+    Returns:
+        np.ndarray: Bob positions of shape (..., n_links, 2).
+    """
+
+    angles, lengths = np.broadcast_arrays(angles, lengths)
+    x = pivot[0] + np.cumsum(lengths * np.cos(angles), axis=-1)
+    y = pivot[1] + np.cumsum(lengths * np.sin(angles), axis=-1)
+    return np.stack((x, y), axis=-1)
+
+
+def momenta(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+            lengths: np.ndarray) -> np.ndarray:
+    """
+    Returns the canonical momenta p = M(angles) @ angular_vels conjugate to the link angles.
+
+    Args:
+        angles (np.ndarray): Link angles of shape (..., n_links).
+        angular_vels (np.ndarray): Angular velocities, same shape as angles.
+        masses (np.ndarray): Bob masses, broadcastable to angles.
+        lengths (np.ndarray): Rod lengths, broadcastable to angles.
+
+    Returns:
+        np.ndarray: The momenta, same shape as angles.
+    """
+
+    return np.einsum('...jk,...k->...j', mass_matrix(angles, masses, lengths), angular_vels)
+
+
+def velocities(angles: np.ndarray, momenta: np.ndarray, masses: np.ndarray,
+               lengths: np.ndarray) -> np.ndarray:
+    """
+    Returns the angular velocities that correspond to canonical momenta.
+
+    Args:
+        angles (np.ndarray): Link angles of shape (..., n_links).
+        momenta (np.ndarray): Canonical momenta, same shape as angles.
+        masses (np.ndarray): Bob masses, broadcastable to angles.
+        lengths (np.ndarray): Rod lengths, broadcastable to angles.
+
+    Returns:
+        np.ndarray: The angular velocities, same shape as angles.
+    """
+
+    return np.linalg.solve(mass_matrix(angles, masses, lengths), momenta[..., None])[..., 0]
+
+
+def momentum_rates(angles: np.ndarray, angular_vels: np.ndarray, masses: np.ndarray,
+                   lengths: np.ndarray, g: float=G, pivot_acc: np.ndarray=None) -> np.ndarray:
+    """
+    Returns the time derivative of the canonical momenta, dp_j / dt = dL / da_j.
+
+    Args:
+        angles (np.ndarray): Link angles of shape (..., n_links).
+        angular_vels (np.ndarray): Angular velocities, same shape as angles.
+        masses (np.ndarray): Bob masses, broadcastable to angles.
+        lengths (np.ndarray): Rod lengths, broadcastable to angles.
+        g (float): Gravitational acceleration. Default is G.
+        pivot_acc (np.ndarray): The (A_x, A_y) acceleration of the pivot. Default is None.
+
+    Returns:
+        np.ndarray: The momentum rates, same shape as angles.
+    """
+
+    angles, angular_vels, masses, lengths = np.broadcast_arrays(angles, angular_vels, masses, lengths)
+    diff = angles[..., :, None] - angles[..., None, :]
+    coupled = _coupled_masses(masses) * lengths[..., None, :]
+    centrifugal = np.sum(coupled * np.sin(diff) * angular_vels[..., None, :], axis=-1)
+    return lengths * (_suffix_sums(masses) * _gravity(angles, g, pivot_acc) - angular_vels * centrifugal)
+
+
+_NO_FORCING = np.zeros((0, 3, 2))
+
+
+def _kernels():
+    """Returns the kernels module, importing it (and numba) on first use."""
+
+    import kernels
+    return kernels
+
+
+class Chain:
+    """
+    Represents a single N-link pendulum chain.
+
+    Attributes:
+        angles (np.ndarray): Link angles, measured from the +x axis with y pointing down.
+        angular_vels (np.ndarray): Angular velocity of every link.
+        masses (np.ndarray): Mass of every bob.
+        lengths (np.ndarray): Length of every rod.
+        g (float): Gravitational acceleration.
+        t (float): Simulated time.
+        method (str): The integrator used by step(), one of integrators.METHODS.
+        rtol (float): Relative error tolerance of the adaptive 'rk45' integrator.
+        atol (float): Absolute error tolerance of the adaptive 'rk45' integrator.
+        adaptive_dt (float): The step size the adaptive integrator will try next.
+        n_evals (int): The number of right-hand side evaluations performed so far.
+        backend (str): 'numba' when the compiled kernels are used, otherwise 'numpy'.
+        forcing (ForcingTable): The pivot acceleration as a function of t, None for a fixed pivot.
+
+    Methods:
+        derivatives(angles: np.ndarray, angular_vels: np.ndarray, t: float) -> tuple:
+            Returns the time derivatives of the angles and angular velocities.
+        step(dt: float) -> None:
+            Advances the chain by one time step with the selected integrator.
+        run(dt: float, n_steps: int) -> None:
+            Advances the chain by n_steps time steps.
+        energy() -> float:
+            Returns the total energy of the chain.
+        positions(pivot: tuple=(0, 0)) -> np.ndarray:
+            Returns the cartesian position of every bob.
+    """
+
+    def __init__(self, angles, masses, lengths, angular_vels=None, g: float=G,
+                 method: str='rk4', backend: str='auto', forcing=None) -> None:
+
+        self.angles = np.array(angles, dtype=float)
+        self.masses = np.array(masses, dtype=float)
+        self.lengths = np.array(lengths, dtype=float)
+        if angular_vels is None:
+            self.angular_vels = np.zeros_like(self.angles)
+        else:
+            self.angular_vels = np.array(angular_vels, dtype=float)
+
+        if not (self.angles.shape == self.angular_vels.shape == self.masses.shape == self.lengths.shape):
+            raise ValueError("angles, angular_vels, masses and lengths must have the same shape")
+
+        if method not in integrators.METHODS:
+            raise ValueError(f"unknown integrator '{method}', expected one of {integrators.METHODS}")
+
+        self.g = g
+        self.t = 0.0
+        self.method = method
+        self.rtol, self.atol = 1e-8, 1e-10
+        self.adaptive_dt = None
+        self.n_evals = 0
+        self.forcing = forcing
+
+        if backend == 'auto':
+            backend = 'numba' if _kernels().HAVE_NUMBA else 'numpy'
+        if backend == 'numba' and not _kernels().HAVE_NUMBA:
+            raise ValueError("the 'numba' backend needs numba to be installed")
+        if backend not in ('numpy', 'numba'):
+            raise ValueError(f"unknown backend '{backend}', expected 'numpy', 'numba' or 'auto'")
+        self.backend = backend
+
+    @property
+    def n_links(self) -> int:
+
+        return self.angles.shape[-1]
+
+    def derivatives(self, angles: np.ndarray, angular_vels: np.ndarray, t: float) -> tuple:
+
+        self.n_evals += 1
+        pivot_acc = self.forcing(t) if self.forcing is not None else None
+        if self.backend == 'numba':
+            ax, ay = pivot_acc if pivot_acc is not None else (0.0, 0.0)
+            out = np.empty(angles.shape)
+            _kernels().accelerations(*self._batched(angles, angular_vels, self.masses, self.lengths),
+                                     self.g, out.reshape(-1, self.n_links), ax, ay)
+            return angular_vels, out
+        return angular_vels, accelerations(angles, angular_vels, self.masses, self.lengths, self.g, pivot_acc)
+
+    def _batched(self, *arrays) -> tuple:
+        """Returns contiguous (n_systems, n_links) views of arrays for the compiled kernels."""
+
+        return tuple(np.ascontiguousarray(arr, dtype=float).reshape(-1, self.n_links) for arr in arrays)
+
+    def momenta(self, angles: np.ndarray, angular_vels: np.ndarray) -> np.ndarray:
+
+        return momenta(angles, angular_vels, self.masses, self.lengths)
+
+    def velocities(self, angles: np.ndarray, momenta: np.ndarray) -> np.ndarray:
+
+        return velocities(angles, momenta, self.masses, self.lengths)
+
+    def momentum_rates(self, angles: np.ndarray, angular_vels: np.ndarray, t: float) -> np.ndarray:
+
+        self.n_evals += 1
+        pivot_acc = self.forcing(t) if self.forcing is not None else None
+        return momentum_rates(angles, angular_vels, self.masses, self.lengths, self.g, pivot_acc)
+
+    def step(self, dt: float) -> None:
+        """Advances the chain by dt with the integrator named by self.method."""
+
+        if self.method == 'rk45':
+            integrators.adaptive_advance(self, dt)
+            return
+        if self.backend == 'numba' and self.method == 'rk4':
+            self.run(dt, 1)
+            return
+
+        self.angles, self.angular_vels = integrators.STEPPERS[self.method](
+            self, self.angles, self.angular_vels, self.t, dt)
+        self.t += dt
+
+    def run(self, dt: float, n_steps: int) -> None:
+
+        if self.backend == 'numba' and self.method == 'rk4':
+            # the whole run stays inside the compiled kernel
+            angles, angular_vels, masses, lengths = self._batched(
+                self.angles, self.angular_vels, self.masses, self.lengths)
+            _kernels().rk4_run(angles, angular_vels, masses, lengths, self.g, dt, n_steps,
+                               self._stage_forcing(dt, n_steps))
+            self.angles, self.angular_vels = angles.reshape(self.angles.shape), angular_vels.reshape(self.angles.shape)
+            self.n_evals += 4 * n_steps
+            self.t += n_steps * dt
+            return
+
+        for _ in range(n_steps):
+            self.step(dt)
+
+    def _stage_forcing(self, dt: float, n_steps: int) -> np.ndarray:
+        """Returns the pivot acceleration at the t, t + dt/2 and t + dt stages of every RK4 step, (n_steps, 3, 2)."""
+
+        if self.forcing is None:
+            return _NO_FORCING
+        times = self.t + dt * (np.arange(n_steps)[:, None] + np.array([0.0, 0.5, 1.0]))
+        return self.forcing.sample(times)
+
+    def energy(self) -> float:
+
+        return float(total_energy(self.angles, self.angular_vels, self.masses, self.lengths, self.g))
+
+    def positions(self, pivot: tuple=(0, 0)) -> np.ndarray:
+
+        return positions(self.angles, self.lengths, pivot)
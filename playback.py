@@ -0,0 +1,141 @@
+"""
+A module containing a playback cursor that streams recorded trajectories from disk.
+
+Playback keeps only one block of frames in memory at a time and loads the block around the
+cursor on demand, so opening or scrubbing through a multi-hour recording starts instantly
+and memory use is bounded by block_frames regardless of the recording length. It does not
+depend on pygame; the app drives it and draws the state it returns.
+
+Classes:
+    Playback:
+        Represents a play/pause/seek cursor over a TrajectoryReader.
+
+        Methods:
+            __init__(path: str, block_frames: int=4096) -> None:
+                Initializes a new Playback object.
+            toggle() -> None:
+                Switches between playing and paused.
+            seek(t: float) -> None:
+                Moves the cursor to time t, clamped to the recording.
+            set_speed(speed: float) -> None:
+                Sets the playback speed, clamped to [MIN_SPEED, MAX_SPEED].
+            faster() -> None:
+                Moves to the next faster preset speed.
+            slower() -> None:
+                Moves to the next slower preset speed.
+            update(real_dt: float) -> None:
+                Advances the cursor by real_dt seconds of wall-clock time.
+            state() -> tuple:
+                Returns the (angles, angular_vels) at the cursor.
+            params() -> dict:
+                Returns the recorded parameters in force at the cursor.
+"""
+
+import bisect
+import numpy as np
+
+from recorder import TrajectoryReader
+
+MIN_SPEED, MAX_SPEED = 0.1, 100.0
+SPEED_PRESETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+
+class Playback:
+    """
+    Represents a play/pause/seek cursor over a TrajectoryReader.
+
+    Attributes:
+        reader (TrajectoryReader): The recording being played.
+        t (float): The cursor time.
+        t_start (float): The time of the first frame.
+        t_end (float): The time of the last frame.
+        speed (float): Simulated seconds per wall-clock second.
+        playing (bool): Whether update() advances the cursor.
+    """
+
+    def __init__(self, path: str, block_frames: int=4096) -> None:
+
+        self.reader = TrajectoryReader(path)
+        if len(self.reader) == 0:
+            raise ValueError(f"{path} holds no frames")
+
+        self.block_frames = block_frames
+        self._block_start = -1
+        self._block_t = self._block_angles = self._block_vels = None
+
+        self.t_start = self.reader.slice(0, 1)[0][0]
+        self.t_end = self.reader.slice(len(self.reader) - 1, len(self.reader))[0][0]
+        self.t = self.t_start
+        self.speed = 1.0
+        self.playing = True
+
+    @property
+    def duration(self) -> float:
+
+        return self.t_end - self.t_start
+
+    def toggle(self) -> None:
+
+        self.playing = not self.playing
+
+    def seek(self, t: float) -> None:
+
+        self.t = min(max(t, self.t_start), self.t_end)
+
+    def set_speed(self, speed: float) -> None:
+
+        self.speed = min(max(speed, MIN_SPEED), MAX_SPEED)
+
+    def faster(self) -> None:
+
+        index = bisect.bisect_right(SPEED_PRESETS, self.speed)
+        self.set_speed(SPEED_PRESETS[min(index, len(SPEED_PRESETS) - 1)])
+
+    def slower(self) -> None:
+
+        index = bisect.bisect_left(SPEED_PRESETS, self.speed) - 1
+        self.set_speed(SPEED_PRESETS[max(index, 0)])
+
+    def update(self, real_dt: float) -> None:
+
+        if self.playing:
+            self.seek(self.t + real_dt * self.speed)
+            if self.t >= self.t_end:
+                self.playing = False
+
+    def _load_block(self, index: int) -> None:
+        """Loads the block of frames that contains index, replacing the previous block."""
+
+        start = (index // self.block_frames) * self.block_frames
+        if start != self._block_start:
+            # one extra frame so the last frame of a block can still be interpolated
+            self._block_t, self._block_angles, self._block_vels = self.reader.slice(
+                start, start + self.block_frames + 1)
+            self._block_start = start
+
+    def state(self) -> tuple:
+        """
+        Returns the state at the cursor, linearly interpolated between the enclosing frames.
+
+        Returns:
+            tuple: (angles, angular_vels) with the recording's state shape.
+        """
+
+        block = self._block_t
+        if block is None or not (block[0] <= self.t <= block[-1]):
+            self._load_block(max(0, self.reader.index_at(self.t) - 1))
+            block = self._block_t
+
+        i = int(np.clip(np.searchsorted(block, self.t, side='right') - 1, 0, len(block) - 1))
+        j = min(i + 1, len(block) - 1)
+        span = block[j] - block[i]
+        alpha = (self.t - block[i]) / span if span > 0 else 0.0
+
+        angles = self._block_angles[i] + alpha * (self._block_angles[j] - self._block_angles[i])
+        vels = self._block_vels[i] + alpha * (self._block_vels[j] - self._block_vels[i])
+        return angles, vels
+
+    def params(self) -> dict:
+        """Returns the recorded parameters (masses, lengths, ...) in force at the cursor, see TrajectoryReader.params_at."""
+
+        return self.reader.params_at(self.reader.index_at(self.t))
@@ -0,0 +1,154 @@
+"""
+A module containing a low-overhead per-phase frame profiler.
+
+Each frame is split into named phases by calling mark() at the end of every phase, which
+costs one perf_counter() call and one array store. The last `capacity` frames are kept in a
+preallocated ring buffer, summarised as p50/p99 per phase, drawn as an on-screen overlay,
+and exported as CSV (one row per frame) or JSON (summary plus samples).
+
+Classes:
+    PhaseProfiler:
+        Represents a ring buffer of per-phase frame timings.
+
+        Methods:
+            __init__(phases: tuple, capacity: int=600) -> None:
+                Initializes a new PhaseProfiler object.
+            start_frame() -> None:
+                Starts timing a new frame.
+            mark(phase: str) -> None:
+                Ends the named phase, attributing the time since the previous mark to it.
+            end_frame() -> None:
+                Commits the current frame to the ring buffer.
+            samples() -> np.ndarray:
+                Returns the recorded frames in order, in milliseconds.
+            summary() -> dict:
+                Returns p50, p99, mean and max per phase in milliseconds.
+            export_csv(path: str) -> None:
+                Writes one row per recorded frame.
+            export_json(path: str) -> None:
+                Writes the summary and the recorded frames.
+            draw(surface: pygame.Surface, pos: tuple) -> pygame.Rect:
+                Draws the p50/p99 table onto a surface.
+"""
+
+import csv
+import json
+import time
+import numpy as np
+import pygame
+
+import basicUI
+
+
+class PhaseProfiler:
+    """
+    Represents a ring buffer of per-phase frame timings.
+
+    Attributes:
+        phases (tuple): The phase names, in the order they are reported.
+        capacity (int): The number of frames kept.
+        enabled (bool): Whether the overlay is drawn. Timing continues either way.
+        refresh_frames (int): The number of frames between overlay text updates.
+    """
+
+    def __init__(self, phases: tuple, capacity: int=600) -> None:
+
+        self.phases = tuple(phases)
+        self.capacity = capacity
+        self.enabled = False
+        self.refresh_frames = 30
+
+        self._index = {phase: i for i, phase in enumerate(self.phases)}
+        self._buffer = np.zeros((capacity, len(self.phases)))
+        # a plain list, since scalar updates on it are several times cheaper than on an array
+        self._current = [0.0] * len(self.phases)
+        self._frames = 0
+        self._last = time.perf_counter()
+        self._lines = []
+
+    def start_frame(self) -> None:
+
+        self._current = [0.0] * len(self.phases)
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+
+        now = time.perf_counter()
+        self._current[self._index[phase]] += now - self._last
+        self._last = now
+
+    def end_frame(self) -> None:
+
+        self._buffer[self._frames % self.capacity] = self._current
+        self._frames += 1
+
+    def samples(self) -> np.ndarray:
+        """Returns the recorded frames, oldest first, as an (n, len(phases)) array of milliseconds."""
+
+        if self._frames <= self.capacity:
+            return self._buffer[:self._frames] * 1000
+        start = self._frames % self.capacity
+        return np.roll(self._buffer, -start, axis=0) * 1000
+
+    def summary(self) -> dict:
+
+        samples = self.samples()
+        if len(samples) == 0:
+            return {phase: {'p50': 0.0, 'p99': 0.0, 'mean': 0.0, 'max': 0.0} for phase in self.phases}
+
+        p50, p99 = np.percentile(samples, [50, 99], axis=0)
+        mean, peak = samples.mean(axis=0), samples.max(axis=0)
+        return {phase: {'p50': float(p50[i]), 'p99': float(p99[i]), 'mean': float(mean[i]), 'max': float(peak[i])}
+                for i, phase in enumerate(self.phases)}
+
+    def export_csv(self, path: str) -> None:
+
+        first = max(0, self._frames - self.capacity)
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('frame',) + tuple(f"{phase}_ms" for phase in self.phases))
+            for offset, row in enumerate(self.samples()):
+                writer.writerow([first + offset] + [f"{value:.4f}" for value in row])
+
+    def export_json(self, path: str) -> None:
+
+        with open(path, 'w') as file:
+            json.dump({'phases': list(self.phases), 'summary': self.summary(),
+                       'samples_ms': self.samples().round(4).tolist()}, file, indent=2)
+
+    def draw(self, surface: pygame.Surface, pos: tuple, colour: tuple=(0, 0, 0), size: int=20) -> pygame.Rect:
+        """
+        Draws a p50/p99 table of every phase with its top left corner at pos.
+
+        The numbers are only recomputed every refresh_frames frames, which keeps the text
+        cache effective and the overlay readable.
+
+        Returns:
+            pygame.Rect: The area that was drawn on.
+        """
+
+        if not self._lines or self._frames % self.refresh_frames == 0:
+            stats = self.summary()
+            total = sum(s['p50'] for s in stats.values())
+            self._lines = [('phase', 'p50 ms', 'p99 ms')]
+            self._lines += [(phase, f"{s['p50']:.2f}", f"{s['p99']:.2f}") for phase, s in stats.items()]
+            self._lines.append(('total', f"{total:.2f}", ''))
+
+        # the default font is proportional, so every column is placed at its own x: the phase
+        # names left-aligned, the numbers right-aligned to the column's right edge
+        cells = [[basicUI.text_cache.render(cell, colour, size) for cell in line] for line in self._lines]
+        gap = size // 2
+        right = pos[0] + max(row[0].get_width() for row in cells)
+        edges = []
+        for column in range(1, len(cells[0])):
+            right += gap + max(row[column].get_width() for row in cells)
+            edges.append(right)
+
+        line_height = int(size * 0.8)
+        area = pygame.Rect(pos, (0, 0))
+        for i, row in enumerate(cells):
+            y = pos[1] + i * line_height
+            area.union_ip(surface.blit(row[0], (pos[0], y)))
+            for info, edge in zip(row[1:], edges):
+                area.union_ip(surface.blit(info, (edge - info.get_width(), y)))
+        return area
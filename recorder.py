@@ -0,0 +1,367 @@
+"""
+A module containing a streaming trajectory recorder and a lazy reader for its files.
+
+A recording is a directory of fixed-size chunk files plus a small JSON header:
+
+    meta.json           state shape, frame count, parameter layout and caller metadata (g, ...)
+    chunk_000000.npy    (chunk_frames, 1 + 2 * state_size) float64, memory-mapped
+    chunk_000001.npy    ...
+    params.bin          raw float64 rows [frame, *values.ravel()], one per parameter change
+
+Every frame row is [t, angles.ravel(), angular_vels.ravel()]. Frames are collected in a
+preallocated write buffer and copied into the memory-mapped chunk once per buffer, so a
+long run costs constant memory and one memcpy per buffer of frames. The buffer and the
+chunks are capped at buffer_bytes and CHUNK_BYTES, so a frame of a 100k system ensemble
+gets fewer rows rather than gigabytes of buffer. The header is rewritten on every flush, so
+a crashed run keeps everything up to the last flush.
+
+Parameters that can change during a run, such as masses, lengths or the pivot, are kept out
+of the header. Each change is appended once to params.bin with the index of the first frame
+it applies to, and the header only counts the rows, so it stays small however large the
+arrays are and a replay can draw every frame with the parameters it was simulated with.
+
+The reader maps chunks only when a frame inside them is requested, so slicing a time window
+out of a multi-GB recording touches a handful of pages instead of loading the whole file.
+
+Classes:
+    TrajectoryRecorder:
+        Represents an open recording that frames are streamed into.
+
+        Methods:
+            __init__(path: str, state_shape: tuple, meta: dict=None, chunk_frames: int=65536,
+                     buffer_frames: int=1024, params: dict=None, buffer_bytes: int=BUFFER_BYTES) -> None:
+                Initializes a new TrajectoryRecorder object.
+            from_chain(path: str, chain: Chain, chunk_frames: int=65536, buffer_frames: int=1024,
+                       params: dict=None, buffer_bytes: int=BUFFER_BYTES, **meta) -> TrajectoryRecorder:
+                Creates a recorder for a chain, recording its masses and lengths as parameters.
+            record(t: float, angles: np.ndarray, angular_vels: np.ndarray) -> None:
+                Appends one frame.
+            set_params(**values) -> None:
+                Records new parameter values, in force from the next frame recorded.
+            record_chain(chain: Chain) -> None:
+                Appends the current state of a chain.
+            flush() -> None:
+                Writes buffered frames to the chunk files.
+            close() -> None:
+                Flushes and closes the recording.
+
+    TrajectoryReader:
+        Represents a finished or in-progress recording opened for reading.
+
+        Methods:
+            __init__(path: str, max_open_chunks: int=4) -> None:
+                Initializes a new TrajectoryReader object.
+            refresh() -> None:
+                Rereads the header to pick up newly flushed frames.
+            params_at(index: int) -> dict:
+                Returns the parameter values in force at a frame.
+            frames(start: int, stop: int) -> np.ndarray:
+                Returns the raw frame rows in [start, stop).
+            slice(start: int, stop: int) -> tuple:
+                Returns (t, angles, angular_vels) for the frames in [start, stop).
+            index_at(t: float) -> int:
+                Returns the index of the first frame at or after time t.
+            window(t_start: float, t_stop: float) -> tuple:
+                Returns (t, angles, angular_vels) for the frames with t_start <= t < t_stop.
+"""
+
+import os
+import json
+import bisect
+from collections import OrderedDict
+import numpy as np
+
+META_NAME = 'meta.json'
+PARAMS_NAME = 'params.bin'
+
+# default write buffer and largest chunk file, in bytes
+BUFFER_BYTES = 16 << 20
+CHUNK_BYTES = 1 << 30
+
+
+def _chunk_path(path: str, chunk: int) -> str:
+
+    return os.path.join(path, f"chunk_{chunk:06d}.npy")
+
+
+def _write_json(file_path: str, data: dict) -> None:
+
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file, indent=2)
+    os.replace(tmp_path, file_path)
+
+
+class TrajectoryRecorder:
+    """
+    Represents an open recording that frames are streamed into.
+
+    Attributes:
+        path (str): The recording directory.
+        state_shape (tuple): The shape of the angles array of every frame.
+        chunk_frames (int): The number of frames per chunk file, at most CHUNK_BYTES of them.
+        n_frames (int): The number of frames recorded so far, including buffered ones.
+        meta (dict): Caller metadata saved in the header.
+        params (dict): The current value of every parameter, name -> array.
+    """
+
+    def __init__(self, path: str, state_shape: tuple, meta: dict=None, chunk_frames: int=65536,
+                 buffer_frames: int=1024, params: dict=None, buffer_bytes: int=BUFFER_BYTES) -> None:
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, META_NAME)):
+            raise FileExistsError(f"{path} already holds a recording")
+
+        self.path = path
+        self.state_shape = tuple(state_shape)
+        self.state_size = int(np.prod(self.state_shape))
+        self.width = 1 + 2 * self.state_size
+        row_bytes = 8 * self.width
+        self.chunk_frames = max(1, min(chunk_frames, CHUNK_BYTES // row_bytes))
+        self.meta = dict(meta or {})
+
+        self.n_frames = 0
+        self._flushed = 0
+        self._buffer = np.empty((max(1, min(buffer_frames, buffer_bytes // row_bytes)), self.width))
+        self._buffered = 0
+        self._chunk = None
+        self._chunk_index = -1
+
+        self.params = {name: np.array(value, dtype=float) for name, value in (params or {}).items()}
+        self._params_file = open(os.path.join(path, PARAMS_NAME), 'wb')
+        self._n_changes = 0
+        self._write_params()
+
+    @classmethod
+    def from_chain(cls, path: str, chain, chunk_frames: int=65536, buffer_frames: int=1024,
+                   params: dict=None, buffer_bytes: int=BUFFER_BYTES, **meta) -> "TrajectoryRecorder":
+
+        params = dict(params or {}, masses=chain.masses, lengths=chain.lengths)
+        meta.update(g=chain.g)
+        return cls(path, chain.angles.shape, meta, chunk_frames, buffer_frames, params, buffer_bytes)
+
+    def record(self, t: float, angles: np.ndarray, angular_vels: np.ndarray) -> None:
+
+        row = self._buffer[self._buffered]
+        row[0] = t
+        row[1:1 + self.state_size] = np.ravel(angles)
+        row[1 + self.state_size:] = np.ravel(angular_vels)
+
+        self._buffered += 1
+        self.n_frames += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    def record_chain(self, chain) -> None:
+
+        self.record(chain.t, chain.angles, chain.angular_vels)
+
+    def set_params(self, **values) -> None:
+        """
+        Records new values for some of the parameters, in force from the next frame recorded.
+        Values equal to the current ones are ignored, so it can be called on every step.
+
+        Raises:
+            KeyError: If a name was not among the params the recording was created with.
+        """
+
+        changed = False
+        for name, value in values.items():
+            current = self.params[name]
+            if not np.array_equal(current, value):
+                current[...] = value
+                changed = True
+        if changed:
+            self._write_params()
+
+    def _write_params(self) -> None:
+
+        if not self.params:
+            return
+        self._params_file.write(np.float64(self.n_frames).tobytes())
+        for value in self.params.values():
+            self._params_file.write(value.tobytes())
+        self._n_changes += 1
+
+    def flush(self) -> None:
+        """Copies buffered frames into the memory-mapped chunks and rewrites the header."""
+
+        done = 0
+        while done < self._buffered:
+            chunk, offset = divmod(self._flushed, self.chunk_frames)
+            if chunk != self._chunk_index:
+                self._open_chunk(chunk)
+
+            count = min(self._buffered - done, self.chunk_frames - offset)
+            self._chunk[offset:offset + count] = self._buffer[done:done + count]
+            done += count
+            self._flushed += count
+
+        self._buffered = 0
+        self._params_file.flush()
+        self._write_meta()
+
+    def _open_chunk(self, chunk: int) -> None:
+
+        if self._chunk is not None:
+            self._chunk.flush()
+        self._chunk = np.lib.format.open_memmap(_chunk_path(self.path, chunk), mode='w+',
+                                                dtype=float, shape=(self.chunk_frames, self.width))
+        self._chunk_index = chunk
+
+    def _write_meta(self) -> None:
+
+        _write_json(os.path.join(self.path, META_NAME), {
+            'state_shape': list(self.state_shape),
+            'chunk_frames': self.chunk_frames,
+            'n_frames': self._flushed,
+            'params': {name: list(value.shape) for name, value in self.params.items()},
+            'n_param_changes': self._n_changes,
+            'meta': self.meta,
+        })
+
+    def close(self) -> None:
+
+        if self._params_file.closed:
+            return
+        self.flush()
+        self._params_file.close()
+        if self._chunk is not None:
+            self._chunk.flush()
+            self._chunk = None
+
+    def __enter__(self) -> "TrajectoryRecorder":
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.close()
+
+
+class _TimeColumn:
+    """A lazy sequence view of the time column, so bisect only reads O(log n) frames."""
+
+    def __init__(self, reader: "TrajectoryReader") -> None:
+
+        self.reader = reader
+
+    def __len__(self) -> int:
+
+        return len(self.reader)
+
+    def __getitem__(self, index: int) -> float:
+
+        chunk, offset = divmod(index, self.reader.chunk_frames)
+        return float(self.reader._chunk(chunk)[offset, 0])
+
+
+class TrajectoryReader:
+    """
+    Represents a recording opened for reading.
+
+    Attributes:
+        path (str): The recording directory.
+        state_shape (tuple): The shape of the angles array of every frame.
+        chunk_frames (int): The number of frames per chunk file.
+        n_frames (int): The number of frames available.
+        meta (dict): Caller metadata saved by the recorder.
+        param_frames (np.ndarray): The first frame of every parameter change, ascending.
+    """
+
+    def __init__(self, path: str, max_open_chunks: int=4) -> None:
+
+        self.path = path
+        self.max_open_chunks = max_open_chunks
+        self._open = OrderedDict()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Rereads the header, picking up frames flushed since the reader was opened."""
+
+        with open(os.path.join(self.path, META_NAME)) as file:
+            header = json.load(file)
+
+        self.state_shape = tuple(header['state_shape'])
+        self.state_size = int(np.prod(self.state_shape))
+        self.chunk_frames = header['chunk_frames']
+        self.n_frames = header['n_frames']
+        self.meta = header['meta']
+
+        # recordings from before parameter changes were recorded have none
+        self._param_shapes = {name: tuple(shape) for name, shape in header.get('params', {}).items()}
+        width = 1 + sum(int(np.prod(shape)) for shape in self._param_shapes.values())
+        n_changes = header.get('n_param_changes', 0)
+        self._params = np.fromfile(os.path.join(self.path, PARAMS_NAME), count=n_changes * width).reshape(
+            n_changes, width) if n_changes else np.empty((0, width))
+        self.param_frames = self._params[:, 0]
+
+    def params_at(self, index: int) -> dict:
+        """
+        Returns the parameter values in force at frame index, name -> array, or an empty dict
+        if the recording has no parameters.
+        """
+
+        if not len(self._params):
+            return {}
+        row = self._params[max(0, int(np.searchsorted(self.param_frames, index, side='right')) - 1)]
+        values, start = {}, 1
+        for name, shape in self._param_shapes.items():
+            size = int(np.prod(shape))
+            values[name] = row[start:start + size].reshape(shape)
+            start += size
+        return values
+
+    def __len__(self) -> int:
+
+        return self.n_frames
+
+    def _chunk(self, chunk: int) -> np.ndarray:
+        """Returns the memory map of a chunk, keeping at most max_open_chunks of them open."""
+
+        if chunk in self._open:
+            self._open.move_to_end(chunk)
+            return self._open[chunk]
+
+        mapped = np.load(_chunk_path(self.path, chunk), mmap_mode='r')
+        self._open[chunk] = mapped
+        if len(self._open) > self.max_open_chunks:
+            self._open.popitem(last=False)
+        return mapped
+
+    def frames(self, start: int, stop: int) -> np.ndarray:
+        """Returns a copy of the raw frame rows in [start, stop), clipped to the recording."""
+
+        start, stop = max(0, start), min(stop, self.n_frames)
+        out = np.empty((max(0, stop - start), 1 + 2 * self.state_size))
+
+        index = start
+        while index < stop:
+            chunk, offset = divmod(index, self.chunk_frames)
+            count = min(stop - index, self.chunk_frames - offset)
+            out[index - start:index - start + count] = self._chunk(chunk)[offset:offset + count]
+            index += count
+        return out
+
+    def slice(self, start: int, stop: int) -> tuple:
+        """
+        Returns the frames in [start, stop).
+
+        Returns:
+            tuple: (t of shape (n,), angles and angular_vels of shape (n,) + state_shape).
+        """
+
+        rows = self.frames(start, stop)
+        shape = (len(rows),) + self.state_shape
+        return (rows[:, 0],
+                rows[:, 1:1 + self.state_size].reshape(shape),
+                rows[:, 1 + self.state_size:].reshape(shape))
+
+    def index_at(self, t: float) -> int:
+
+        return bisect.bisect_left(_TimeColumn(self), t)
+
+    def window(self, t_start: float, t_stop: float) -> tuple:
+        """Returns (t, angles, angular_vels) for the frames with t_start <= t < t_stop."""
+
+        return self.slice(self.index_at(t_start), self.index_at(t_stop))
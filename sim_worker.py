@@ -0,0 +1,375 @@
+"""
+A module containing a simulation worker process that steps a chain apart from the UI loop.
+
+The worker owns the Chain or Ensemble and steps it on its own fixed-timestep clock, so a
+chain that takes 50 ms per step slows the simulation but never the frame loop drawing it.
+After every slice of steps the worker publishes the state into a SharedState, two
+[t, angles, angular_vels] rows in shared memory, laid out like a recording frame and written
+alternately. Each row is guarded by a sequence counter, seqlock style: the writer makes the
+counter odd, writes the row, makes it even again and only then points `latest` at it. A
+reader copies the latest row and retries if its counter was odd or changed meanwhile, which
+needs the writer to lap it twice during one copy. Neither side ever waits for the other.
+
+NumPy issues no memory fences, so this is only sound where the CPU keeps stores, and loads,
+in program order: x86 and x86-64. Elsewhere (ARM, e.g. a Raspberry Pi or Apple silicon) a
+reader could see the counters before the row they guard and accept a torn state, so there
+the writes and the copies also take a lock shared by both processes. The lock is held for
+one copy of the state, microseconds, never for a physics step.
+
+Parameter changes go the other way as messages on a queue: slider masses and lengths, the
+pivot acceleration, angle nudges, checkpoint requests and stop. The worker steps a batch in
+slices of about SLICE_SECONDS of wall-clock time, or one step if a step takes longer, and
+drains the queue and publishes after every slice, so a slow chain delays a command by at
+most one step rather than a whole batch. Recording, statistics and checkpointing run inside
+the worker, next to the steps they observe.
+
+The process is started with the spawn method, since forking a process that has already
+initialized SDL or numba's thread pool is not safe.
+
+Classes:
+    SharedState:
+        Represents a double-buffered chain state in shared memory.
+
+        Methods:
+            __init__(shape: tuple, name: str=None, lock: multiprocessing.Lock=None) -> None:
+                Creates a new shared block, or attaches to the one called name.
+            publish(t: float, angles: np.ndarray, angular_vels: np.ndarray) -> None:
+                Writes a new state. Only one process may publish.
+            read() -> tuple:
+                Returns a consistent copy of the latest state.
+            close() -> None:
+                Detaches from the block, and frees it if this object created it.
+
+    SimulationWorker:
+        Represents a process stepping a chain in real time.
+
+        Methods:
+            __init__(chain: Chain, dt: float, max_frame_time: float=0.25, record_path: str=None,
+                     record_params: dict=None, stats_path: str=None, stats_sample_every: int=10,
+                     stats_interval: float=60.0, checkpoint_path: str=None) -> None:
+                Initializes a new SimulationWorker object and starts its process.
+            read() -> tuple:
+                Returns the latest (t, angles, angular_vels).
+            set(**values) -> None:
+                Assigns chain arrays (masses, lengths, angles, angular_vels), the pivot bias or
+                recorded parameters such as the pivot.
+            nudge(delta: np.ndarray) -> None:
+                Adds delta to the angles.
+            checkpoint(**extra) -> None:
+                Checkpoints the chain with extra caller state.
+            is_alive() -> bool:
+                Returns whether the process is still running.
+            stop(timeout: float=STOP_TIMEOUT, **extra) -> None:
+                Stops the process, writing a final checkpoint with extra if checkpointing.
+"""
+
+import sys
+import time
+import queue
+import signal
+import platform
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+import forcing
+
+# latest row index and the sequence counter of each row, padded to a cache line
+HEADER_BYTES = 64
+
+# the wall-clock time the worker steps for before checking for commands again
+SLICE_SECONDS = 0.01
+
+# how long stop() waits for the worker to finish before terminating it
+STOP_TIMEOUT = 5.0
+
+# whether stores become visible to other cores in program order, which the seqlock relies on
+STORE_ORDERED = platform.machine().lower() in ('x86_64', 'amd64', 'i386', 'i686', 'x86')
+
+
+class SharedState:
+    """
+    Represents a double-buffered chain state in shared memory.
+
+    Attributes:
+        name (str): The name of the shared memory block, used to attach from another process.
+        shape (tuple): The shape of angles and angular_vels.
+        lock (multiprocessing.Lock): Guards every publish and read where the seqlock alone is
+            not safe, None on x86. Every process using the block must pass the same lock.
+        n_retries (int): The number of reads in this process that had to be retried.
+    """
+
+    def __init__(self, shape: tuple, name: str=None, lock=None) -> None:
+
+        self.shape = tuple(shape)
+        self._size = int(np.prod(self.shape))
+        width = 1 + 2 * self._size
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + 2 * width * 8)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self.lock = lock
+
+        self._header = np.ndarray(3, dtype=np.int64, buffer=self._shm.buf)
+        self._rows = np.ndarray((2, width), dtype=np.float64, buffer=self._shm.buf, offset=HEADER_BYTES)
+        self._row = np.empty(width)
+        self.n_retries = 0
+
+    def publish(self, t: float, angles: np.ndarray, angular_vels: np.ndarray) -> None:
+
+        if self.lock is None:
+            self._publish(t, angles, angular_vels)
+        else:
+            with self.lock:
+                self._publish(t, angles, angular_vels)
+
+    def _publish(self, t: float, angles: np.ndarray, angular_vels: np.ndarray) -> None:
+
+        header, size = self._header, self._size
+        back = 1 - int(header[0])
+        seq = int(header[1 + back])
+
+        # only sound without a lock where stores are seen in program order, see STORE_ORDERED
+        header[1 + back] = seq + 1
+        row = self._rows[back]
+        row[0] = t
+        row[1:1 + size] = np.ravel(angles)
+        row[1 + size:] = np.ravel(angular_vels)
+        header[1 + back] = seq + 2
+        header[0] = back
+
+    def read(self) -> tuple:
+        """
+        Returns a consistent copy of the latest state. Without a lock it never blocks the writer.
+
+        Returns:
+            tuple: (t, angles, angular_vels). The arrays are reused by the next read().
+        """
+
+        if self.lock is None:
+            return self._read()
+        with self.lock:
+            return self._read()
+
+    def _read(self) -> tuple:
+
+        header, row = self._header, self._row
+        while True:
+            latest = int(header[0])
+            seq = int(header[1 + latest])
+            if not seq & 1:
+                np.copyto(row, self._rows[latest])
+                if int(header[1 + latest]) == seq:
+                    break
+            self.n_retries += 1
+
+        size = self._size
+        return row[0], row[1:1 + size].reshape(self.shape), row[1 + size:].reshape(self.shape)
+
+    def close(self) -> None:
+
+        if self._shm is None:
+            return
+        # the views must go before the block can be unmapped
+        del self._header, self._rows
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+def _run(chain, state_name: str, lock, commands, dt: float, max_frame_time: float, options: dict) -> None:
+    """The worker process: steps chain in real time, publishing after every slice."""
+
+    from recorder import TrajectoryRecorder
+    from online_stats import OnlineStats
+    from checkpoint import Checkpointer
+
+    # Ctrl+C reaches the whole process group, but only the UI decides when the worker stops
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    state = SharedState(chain.angles.shape, state_name, lock)
+    recorder = stats = checkpointer = None
+    if options['record_path']:
+        recorder = TrajectoryRecorder.from_chain(options['record_path'], chain, dt=dt,
+                                                 params=options['record_params'])
+    if options['stats_path']:
+        stats = OnlineStats(chain, options['stats_sample_every'], options['stats_interval'],
+                            options['stats_path'])
+    if options['checkpoint_path']:
+        checkpointer = Checkpointer(options['checkpoint_path'])
+
+    driven = chain.forcing is not None
+    pivot_forcing = chain.forcing or forcing.constant()
+    accumulator = 0.0
+    step_seconds = SLICE_SECONDS
+
+    # applies every queued command, returning False once told to stop
+    def drain() -> bool:
+        while True:
+            try:
+                command, payload = commands.get_nowait()
+            except queue.Empty:
+                return True
+            if command == 'set':
+                for name, value in payload.items():
+                    if name == 'bias':
+                        pivot_forcing.bias[:] = value
+                        chain.forcing = pivot_forcing if driven or pivot_forcing.bias.any() else None
+                    elif name != 'pivot':
+                        getattr(chain, name)[:] = value
+                if recorder:
+                    recorder.set_params(**{name: value for name, value in payload.items()
+                                           if name in recorder.params})
+            elif command == 'nudge':
+                chain.angles += payload
+            elif command in ('checkpoint', 'stop'):
+                if checkpointer:
+                    try:
+                        checkpointer.save(chain, accumulator=accumulator, **payload)
+                    except Exception as error:
+                        print(f"checkpoint to {checkpointer.path} failed: {error}", file=sys.stderr)
+                if command == 'stop':
+                    return False
+
+    def advance(n_steps: int) -> None:
+        if recorder or stats:
+            for _ in range(n_steps):
+                chain.step(dt)
+                if recorder:
+                    recorder.record_chain(chain)
+                if stats:
+                    stats.observe(chain)
+        else:
+            chain.run(dt, n_steps)
+
+    last = time.perf_counter()
+    running = drain()
+    while running:
+
+        # the same capped fixed-timestep accumulator as the frame loop, on the worker's clock
+        now = time.perf_counter()
+        accumulator += min(now - last, max_frame_time)
+        last = now
+        n_steps = int(accumulator / dt)
+        if not n_steps:
+            time.sleep(dt - accumulator)
+            running = drain()
+            continue
+
+        # stepped in slices of about SLICE_SECONDS, so commands never wait for a whole batch
+        while n_steps and running:
+            count = max(1, min(n_steps, int(SLICE_SECONDS / step_seconds)))
+            start = time.perf_counter()
+            advance(count)
+            step_seconds = max((time.perf_counter() - start) / count, 1e-9)
+            accumulator -= count * dt
+            n_steps -= count
+            state.publish(chain.t, chain.angles, chain.angular_vels)
+            running = drain()
+
+    for hook in (recorder, stats):
+        if hook:
+            hook.close()
+    if checkpointer:
+        try:
+            checkpointer.close()
+        except Exception as error:
+            print(f"checkpoint to {checkpointer.path} failed: {error}", file=sys.stderr)
+    state.close()
+
+
+class SimulationWorker:
+    """
+    Represents a process stepping a chain in real time.
+
+    The chain is copied into the process when it starts; afterwards it is only reached
+    through read() and the parameter methods, so the caller's chain object goes stale.
+    When recording, masses and lengths set() during the run are recorded as parameter
+    changes, like any of the extra record_params (e.g. the pivot) passed to set().
+
+    Attributes:
+        state (SharedState): The block the worker publishes into.
+        process (multiprocessing.Process): The worker process.
+    """
+
+    def __init__(self, chain, dt: float, max_frame_time: float=0.25, record_path: str=None,
+                 record_params: dict=None, stats_path: str=None, stats_sample_every: int=10,
+                 stats_interval: float=60.0, checkpoint_path: str=None) -> None:
+
+        context = multiprocessing.get_context('spawn')
+        self.state = SharedState(chain.angles.shape, lock=None if STORE_ORDERED else context.Lock())
+        self.state.publish(chain.t, chain.angles, chain.angular_vels)
+        self._commands = context.Queue()
+
+        options = {'record_path': record_path, 'record_params': record_params, 'stats_path': stats_path,
+                   'stats_sample_every': stats_sample_every, 'stats_interval': stats_interval,
+                   'checkpoint_path': checkpoint_path}
+        self.process = context.Process(target=_run, name='simulation-worker', daemon=True,
+                                       args=(chain, self.state.name, self.state.lock, self._commands,
+                                             dt, max_frame_time, options))
+        try:
+            self.process.start()
+        except BaseException:
+            self.state.close()
+            raise
+
+    def read(self) -> tuple:
+
+        return self.state.read()
+
+    def set(self, **values) -> None:
+
+        self._commands.put(('set', values))
+
+    def nudge(self, delta: np.ndarray) -> None:
+
+        self._commands.put(('nudge', np.asarray(delta, dtype=float)))
+
+    def checkpoint(self, **extra) -> None:
+
+        self._commands.put(('checkpoint', extra))
+
+    def is_alive(self) -> bool:
+
+        return self.process.is_alive()
+
+    def stop(self, timeout: float=STOP_TIMEOUT, **extra) -> None:
+        """
+        Stops the process and frees the shared block, also when the process already died.
+        A process that has not finished within timeout seconds, e.g. stuck in one very slow
+        step, is terminated, losing its final checkpoint and any unflushed recording.
+
+        Raises:
+            RuntimeError: If the process failed, i.e. exited with a positive status, or had
+                to be terminated.
+        """
+
+        terminated = False
+        try:
+            if self.process.is_alive():
+                self._commands.put(('stop', extra))
+                self.process.join(timeout)
+                if self.process.is_alive():
+                    self.process.terminate()
+                    self.process.join(timeout)
+                    if self.process.is_alive():
+                        self.process.kill()
+                        self.process.join()
+                    terminated = True
+        finally:
+            self.state.close()
+        if terminated:
+            raise RuntimeError(f"simulation worker did not stop within {timeout}s and was terminated")
+        # a negative exit code is a signal from outside, which the caller is getting too
+        if (self.process.exitcode or 0) > 0:
+            raise RuntimeError(f"simulation worker exited with status {self.process.exitcode}")
+
+    def __enter__(self) -> "SimulationWorker":
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.stop()
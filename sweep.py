@@ -0,0 +1,270 @@
+"""
+A module containing a resumable, multi-core parameter sweep over double pendulums.
+
+A sweep crosses the parameters exposed as sliders in the pygame app (mass1, mass2, radius1,
+radius2) with the initial angles, shards the resulting grid, and runs the shards headless in
+a process pool. Each shard integrates all of its grid points as one Ensemble, together with
+a slightly perturbed copy of every point for the Lyapunov estimate.
+
+Finished shards are written atomically to the output directory, so a killed sweep started
+again with the same arguments skips every shard that is already on disk.
+
+Summary statistics per grid point:
+    max_angle1, max_angle2: The largest deviation of each link from hanging straight down.
+    flip_time: The first time either link swings over the top, NaN if it never does.
+    lyapunov: The largest Lyapunov exponent estimate, from two-trajectory renormalisation.
+
+Classes:
+    ParameterGrid:
+        Represents the cartesian product of per-parameter value lists.
+
+        Methods:
+            __init__(values: dict) -> None:
+                Initializes a new ParameterGrid object.
+            points(indices: np.ndarray) -> dict:
+                Returns the parameter arrays of the given grid points.
+
+Functions:
+    run_shard(grid: ParameterGrid, indices: np.ndarray, duration: float, dt: float,
+              sample_every: int=10) -> dict:
+        Runs one shard of the grid and returns its summary statistics.
+    run_sweep(grid: ParameterGrid, out_dir: str, duration: float=10.0, dt: float=1e-3,
+              shard_size: int=1024, workers: int=None) -> dict:
+        Runs every missing shard of a sweep and returns the gathered results.
+    load_results(out_dir: str) -> dict:
+        Gathers the results of every finished shard in an output directory.
+"""
+
+import os
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from ensemble import Ensemble
+
+PARAMS = ('mass1', 'mass2', 'radius1', 'radius2', 'angle1', 'angle2')
+DEFAULTS = {'mass1': 1.0, 'mass2': 1.0, 'radius1': 2.0, 'radius2': 1.0, 'angle1': 0.1, 'angle2': 0.9}
+STATS = ('max_angle1', 'max_angle2', 'flip_time', 'lyapunov')
+
+# pixels per radius unit, as drawn by pendulum_motion.Particle
+RADIUS_SCALE = 100
+REST_ANGLE = np.pi / 2
+LYAPUNOV_SEPARATION = 1e-8
+
+
+class ParameterGrid:
+    """
+    Represents the cartesian product of per-parameter value lists.
+
+    Parameters that are not given keep their DEFAULTS value. Grid points are numbered in
+    itertools.product order, so an index identifies a point across restarts.
+
+    Attributes:
+        values (dict): Parameter name to the list of values it takes.
+        shape (tuple): The number of values of every parameter, in PARAMS order.
+        size (int): The number of grid points.
+    """
+
+    def __init__(self, values: dict) -> None:
+
+        unknown = set(values) - set(PARAMS)
+        if unknown:
+            raise ValueError(f"unknown sweep parameters {sorted(unknown)}, expected some of {PARAMS}")
+
+        self.values = {name: [float(v) for v in np.atleast_1d(values.get(name, DEFAULTS[name]))]
+                       for name in PARAMS}
+        self.shape = tuple(len(self.values[name]) for name in PARAMS)
+        self.size = int(np.prod(self.shape))
+
+    def points(self, indices: np.ndarray) -> dict:
+        """Returns a dict of parameter name to the values at the given flat grid indices."""
+
+        coords = np.unravel_index(indices, self.shape)
+        return {name: np.asarray(self.values[name])[coord] for name, coord in zip(PARAMS, coords)}
+
+
+def run_shard(grid: ParameterGrid, indices: np.ndarray, duration: float, dt: float,
+              sample_every: int=10) -> dict:
+    """
+    Runs one shard of the grid as a single ensemble and returns its summary statistics.
+
+    Angles are checked and the Lyapunov pair renormalised every sample_every steps, so flip
+    times are resolved to sample_every * dt.
+
+    Args:
+        grid (ParameterGrid): The sweep grid.
+        indices (np.ndarray): The flat grid indices of the shard.
+        duration (float): The simulated time per grid point.
+        dt (float): The integration time step.
+        sample_every (int): The number of steps between samples. Default is 10.
+
+    Returns:
+        dict: 'index' and one array per name in STATS.
+    """
+
+    p = grid.points(indices)
+    n = len(indices)
+    angles = np.stack((p['angle1'], p['angle2']), axis=-1)
+    masses = np.stack((p['mass1'], p['mass2']), axis=-1)
+    lengths = np.stack((p['radius1'], p['radius2']), axis=-1) * RADIUS_SCALE
+
+    # rows [0, n) are the grid points, rows [n, 2n) their perturbed Lyapunov partners
+    perturbed = angles + LYAPUNOV_SEPARATION / np.sqrt(2)
+    ensemble = Ensemble(np.concatenate((angles, perturbed)), np.concatenate((masses, masses)),
+                        np.concatenate((lengths, lengths)))
+
+    # velocities are measured in units of the natural frequency so both halves of the
+    # phase-space separation are dimensionless angles
+    time_scale = np.sqrt(lengths.sum(axis=-1) / ensemble.g)[:, None]
+
+    max_angle = np.abs(angles - REST_ANGLE)
+    flip_time = np.full(n, np.nan)
+    log_growth = np.zeros(n)
+    n_samples = max(1, int(round(duration / dt)) // sample_every)
+
+    for _ in range(n_samples):
+        ensemble.run(dt, sample_every)
+
+        deviation = np.abs(ensemble.angles[:n] - REST_ANGLE)
+        np.maximum(max_angle, deviation, out=max_angle)
+        flipped = np.isnan(flip_time) & np.any(deviation > np.pi, axis=-1)
+        flip_time[flipped] = ensemble.t
+
+        delta_a = ensemble.angles[n:] - ensemble.angles[:n]
+        delta_w = ensemble.angular_vels[n:] - ensemble.angular_vels[:n]
+        separation = np.sqrt(np.sum(delta_a ** 2 + (delta_w * time_scale) ** 2, axis=-1))
+        separation = np.maximum(separation, np.finfo(float).tiny)
+        log_growth += np.log(separation / LYAPUNOV_SEPARATION)
+
+        scale = (LYAPUNOV_SEPARATION / separation)[:, None]
+        ensemble.angles[n:] = ensemble.angles[:n] + delta_a * scale
+        ensemble.angular_vels[n:] = ensemble.angular_vels[:n] + delta_w * scale
+
+    return {
+        'index': np.asarray(indices),
+        'max_angle1': max_angle[:, 0],
+        'max_angle2': max_angle[:, 1],
+        'flip_time': flip_time,
+        'lyapunov': log_growth / ensemble.t,
+    }
+
+
+def _shard_path(out_dir: str, shard: int) -> str:
+
+    return os.path.join(out_dir, f"shard_{shard:06d}.npz")
+
+
+def _run_and_save(grid: ParameterGrid, indices: np.ndarray, path: str, duration: float, dt: float) -> str:
+
+    results = run_shard(grid, indices, duration, dt)
+    # write to a temporary name first so a killed worker never leaves a half-written shard
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **results)
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_sweep(grid: ParameterGrid, out_dir: str, duration: float=10.0, dt: float=1e-3,
+              shard_size: int=1024, workers: int=None) -> dict:
+    """
+    Runs every shard of a sweep that is not already on disk and returns all results.
+
+    The grid and settings are recorded in out_dir/manifest.json on the first run. Later
+    runs into the same directory must use the same ones, otherwise finished shards would be
+    silently mixed with a different sweep.
+
+    Args:
+        grid (ParameterGrid): The sweep grid.
+        out_dir (str): The directory holding the manifest and shard files.
+        duration (float): The simulated time per grid point. Default is 10.0.
+        dt (float): The integration time step. Default is 1e-3.
+        shard_size (int): The number of grid points per shard. Default is 1024.
+        workers (int): The number of worker processes. Default is os.cpu_count().
+
+    Returns:
+        dict: The gathered results, as returned by load_results().
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {'values': grid.values, 'duration': duration, 'dt': dt, 'shard_size': shard_size}
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            if json.load(file) != manifest:
+                raise ValueError(f"{out_dir} holds a sweep with a different grid or settings")
+    else:
+        with open(manifest_path, 'w') as file:
+            json.dump(manifest, file, indent=2)
+
+    shards = [(shard, np.arange(start, min(start + shard_size, grid.size)))
+              for shard, start in enumerate(range(0, grid.size, shard_size))
+              if not os.path.exists(_shard_path(out_dir, shard))]
+
+    if shards:
+        from kernels import single_threaded
+        # spawned, single-threaded workers: forking after numba has started its thread pool is
+        # unsafe, and one numba thread per core in each of one worker per core oversubscribes
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=single_threaded) as pool:
+            futures = [pool.submit(_run_and_save, grid, indices, _shard_path(out_dir, shard), duration, dt)
+                       for shard, indices in shards]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                print(f"\r{done}/{len(shards)} shards finished", end='', flush=True)
+        print()
+
+    return load_results(out_dir)
+
+
+def load_results(out_dir: str) -> dict:
+    """
+    Gathers the results of every finished shard in an output directory.
+
+    Returns:
+        dict: 'index', one array per name in PARAMS and one per name in STATS, ordered by
+            grid index.
+    """
+
+    with open(os.path.join(out_dir, 'manifest.json')) as file:
+        grid = ParameterGrid(json.load(file)['values'])
+
+    parts = []
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith('shard_') and name.endswith('.npz') and '.tmp' not in name:
+            with np.load(os.path.join(out_dir, name)) as shard:
+                parts.append({key: shard[key] for key in ('index',) + STATS})
+
+    if not parts:
+        return {key: np.empty(0) for key in ('index',) + PARAMS + STATS}
+
+    results = {key: np.concatenate([part[key] for part in parts]) for key in ('index',) + STATS}
+    order = np.argsort(results['index'])
+    results = {key: value[order] for key, value in results.items()}
+    results.update(grid.points(results['index']))
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run a resumable double pendulum parameter sweep.")
+    parser.add_argument('out_dir', help="directory for the manifest and shard files")
+    parser.add_argument('--param', nargs=4, action='append', default=[],
+                        metavar=('NAME', 'START', 'STOP', 'NUM'),
+                        help=f"sweep NAME over NUM values from START to STOP, NAME is one of {PARAMS}")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--dt', type=float, default=1e-3)
+    parser.add_argument('--shard-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    values = {name: np.linspace(float(start), float(stop), int(num)).tolist()
+              for name, start, stop, num in args.param}
+    results = run_sweep(ParameterGrid(values), args.out_dir, args.duration, args.dt,
+                        args.shard_size, args.workers)
+
+    flipped = ~np.isnan(results['flip_time'])
+    print(f"{len(results['index'])} points, {int(flipped.sum())} flipped, "
+          f"mean lyapunov {np.mean(results['lyapunov']):.3f} 1/s")
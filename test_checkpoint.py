@@ -0,0 +1,99 @@
+"""
+Tests that a checkpointed chain continues bit-identically to one that was never interrupted,
+and that the background writer surfaces its failures.
+"""
+
+import os
+import numpy as np
+import pytest
+
+import checkpoint
+import forcing
+import integrators
+import kernels
+from physics import Chain
+from ensemble import Ensemble
+from checkpoint import Checkpointer
+
+BACKENDS = ('numpy', 'numba') if kernels.HAVE_NUMBA else ('numpy',)
+DT = 1e-3
+
+
+def _assert_continues_identically(chain, tmp_path, n_before: int=50, n_after: int=50) -> None:
+
+    chain.run(DT, n_before)
+    path = str(tmp_path / 'state.npz')
+    checkpoint.write(path, checkpoint.capture(chain, slider=3))
+    restored, _, extra = checkpoint.load(path)
+
+    chain.run(DT, n_after)
+    restored.run(DT, n_after)
+    assert extra == {'slider': 3}
+    assert restored.t == chain.t
+    assert restored.n_evals == chain.n_evals
+    assert np.array_equal(restored.angles, chain.angles)
+    assert np.array_equal(restored.angular_vels, chain.angular_vels)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('method', integrators.METHODS)
+def test_chain_restore_is_bit_identical(method, backend, tmp_path):
+
+    chain = Chain([0.1, 0.9, 2.0], [1.0, 2.0, 1.5], [200.0, 100.0, 80.0], [0.5, -1.0, 2.0],
+                  method=method, backend=backend)
+    _assert_continues_identically(chain, tmp_path)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_ensemble_restore_is_bit_identical(backend, tmp_path):
+
+    chain = Chain([0.3, 1.2], [1.0, 1.0], [200.0, 100.0], backend=backend)
+    ensemble = Ensemble.from_chain(chain, 64, angle_spread=0.5, seed=1)
+    _assert_continues_identically(ensemble, tmp_path)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_forced_restore_is_bit_identical(backend, tmp_path):
+
+    table = forcing.kapitza(10.0, 50.0)
+    table.bias[:] = (3.0, -2.0)
+    chain = Chain([np.pi / 2 + 0.2], [1.0], [100.0], backend=backend, forcing=table)
+    _assert_continues_identically(chain, tmp_path)
+
+    restored = checkpoint.load(str(tmp_path / 'state.npz'))[0]
+    assert np.array_equal(restored.forcing.acc, table.acc)
+    assert np.array_equal(restored.forcing.bias, table.bias)
+
+
+def test_rng_state_round_trips(tmp_path):
+
+    rng = np.random.default_rng(7)
+    rng.random(10)
+    path = str(tmp_path / 'state.npz')
+    checkpoint.write(path, checkpoint.capture(Chain([0.1], [1.0], [100.0]), rng))
+    restored_rng = checkpoint.load(path)[1]
+    assert np.array_equal(restored_rng.random(5), rng.random(5))
+
+
+def test_unencodable_extra_raises_from_save(tmp_path):
+
+    with Checkpointer(str(tmp_path / 'state.npz')) as checkpointer:
+        with pytest.raises(TypeError):
+            checkpointer.save(Chain([0.1], [1.0], [100.0]), pivot=np.zeros(2))
+        checkpointer.save(Chain([0.1], [1.0], [100.0]), pivot=[0.0, 0.0])
+        checkpointer.wait()
+        assert checkpointer.n_written == 1
+
+
+def test_failed_write_is_raised_again(tmp_path):
+
+    checkpointer = Checkpointer(str(tmp_path / 'missing' / 'state.npz'))
+    checkpointer.save(Chain([0.1], [1.0], [100.0]))
+    with pytest.raises(OSError):
+        checkpointer.wait()
+
+    # the writer thread survives the failure and keeps serving saves
+    os.mkdir(tmp_path / 'missing')
+    checkpointer.save(Chain([0.1], [1.0], [100.0]))
+    checkpointer.close()
+    assert checkpointer.n_written == 1
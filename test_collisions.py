@@ -0,0 +1,73 @@
+"""
+Tests that the grid broad phase finds exactly the overlapping pairs that testing every pair does.
+"""
+
+import numpy as np
+import pytest
+
+from collisions import find_pairs, brute_force_pairs
+
+
+def _pair_set(pairs: tuple) -> set:
+
+    i, j = pairs
+    assert not np.any(i == j)
+    found = {frozenset(pair) for pair in zip(i.tolist(), j.tolist())}
+    assert len(found) == len(i), "a pair was reported twice"
+    return found
+
+
+def _assert_matches_brute_force(points: np.ndarray, radii: np.ndarray, cell_size: float=None) -> None:
+
+    assert _pair_set(find_pairs(points, radii, cell_size)) == _pair_set(brute_force_pairs(points, radii))
+
+
+@pytest.mark.parametrize('n_points', [2, 10, 500, 3000])
+@pytest.mark.parametrize('seed', range(3))
+def test_random_discs(n_points, seed):
+
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 30 * np.sqrt(n_points), (n_points, 2))
+    radii = rng.uniform(3, 12, n_points)
+    _assert_matches_brute_force(points, radii)
+
+
+def test_negative_coordinates_and_cell_boundaries():
+
+    rng = np.random.default_rng(1)
+    # centres snapped near multiples of the cell size, on both sides of zero
+    points = np.round(rng.uniform(-200, 200, (800, 2)) / 20) * 20 + rng.uniform(-0.5, 0.5, (800, 2))
+    _assert_matches_brute_force(points, np.full(800, 10.0))
+
+
+def test_tall_column_does_not_wrap_into_the_next_one():
+
+    # bobs at the bottom of one grid column and the top of the next share nearby keys
+    points = np.array([[0.0, 0.0], [0.0, 1000.0], [25.0, 1000.0], [25.0, 0.0], [26.0, 10.0]])
+    _assert_matches_brute_force(points, np.full(5, 10.0))
+
+
+def test_dense_cluster():
+
+    rng = np.random.default_rng(2)
+    points = rng.normal(0, 15, (400, 2))
+    _assert_matches_brute_force(points, rng.uniform(5, 20, 400))
+
+
+def test_larger_cells():
+
+    rng = np.random.default_rng(3)
+    points = rng.uniform(0, 600, (1000, 2))
+    _assert_matches_brute_force(points, rng.uniform(5, 15, 1000), cell_size=75.0)
+
+
+def test_touching_discs_do_not_overlap():
+
+    points = np.array([[0.0, 0.0], [20.0, 0.0], [39.0, 0.0]])
+    assert _pair_set(find_pairs(points, np.full(3, 10.0))) == {frozenset((1, 2))}
+
+
+def test_fewer_than_two_discs():
+
+    assert _pair_set(find_pairs(np.zeros((1, 2)), np.ones(1))) == set()
+    assert _pair_set(find_pairs(np.zeros((0, 2)), np.ones(0))) == set()
@@ -0,0 +1,36 @@
+"""
+Tests that the adaptive integrator gives up on a state it cannot step instead of retrying forever.
+"""
+
+import numpy as np
+import pytest
+
+import integrators
+from physics import Chain
+
+
+def test_rk45_raises_on_nan_state():
+
+    chain = Chain([0.1, 0.9], [1.0, 1.0], [200.0, 100.0], [np.nan, 0.0], method='rk45')
+    with pytest.raises(FloatingPointError):
+        chain.step(1 / 60)
+
+
+def test_rk45_raises_below_min_step():
+
+    chain = Chain([0.1, 0.9], [1.0, 1.0], [200.0, 100.0], [0.5, -1.0], method='rk45')
+    chain.rtol = chain.atol = 1e-14
+    angles = chain.angles.copy()
+    with pytest.raises(RuntimeError):
+        integrators.adaptive_advance(chain, 1 / 60, min_step=1e-2)
+    # nothing was accepted, so the state is untouched
+    assert np.array_equal(chain.angles, angles)
+
+
+def test_rk45_still_reaches_the_end_of_the_step():
+
+    chain = Chain([0.1, 0.9], [1.0, 1.0], [200.0, 100.0], [0.5, -1.0], method='rk45')
+    for _ in range(60):
+        chain.step(1 / 60)
+    assert chain.t == pytest.approx(1.0)
+    assert np.all(np.isfinite(chain.angles))
@@ -0,0 +1,57 @@
+"""
+Tests that energy drift only measures integration error, not energy put in by parameter
+changes or a driven pivot.
+"""
+
+import numpy as np
+
+import forcing
+from physics import Chain
+from online_stats import OnlineStats
+
+DT = 1e-3
+
+
+def _run(chain, stats: OnlineStats, n_steps: int) -> None:
+
+    for _ in range(n_steps):
+        chain.step(DT)
+        stats.observe(chain)
+
+
+def test_parameter_change_restarts_drift():
+
+    chain = Chain([0.1, 0.9], [1.0, 1.0], [200.0, 100.0])
+    stats = OnlineStats(chain, sample_every=10)
+    _run(chain, stats, 200)
+    drift = stats.max_drift
+    assert 0 < drift < 1e-6
+
+    chain.masses[:] = (10.0, 1.0)
+    chain.lengths[:] = (150.0, 120.0)
+    _run(chain, stats, 200)
+    assert stats.n_energy_resets == 1
+    assert stats.max_drift < 1e-6
+
+
+def test_forced_stretches_report_no_drift():
+
+    chain = Chain([0.1, 0.9], [1.0, 1.0], [200.0, 100.0])
+    stats = OnlineStats(chain, sample_every=10)
+    _run(chain, stats, 100)
+
+    chain.forcing = forcing.harmonic(20.0, 5.0, (1.0, 0.0))
+    _run(chain, stats, 100)
+    assert stats.snapshot()['energy']['drift'] is None
+    assert stats.initial_energy is None
+
+    # forced for fewer steps than a sample apart still restarts the measurement
+    chain.forcing = None
+    _run(chain, stats, 10)
+    chain.forcing = forcing.harmonic(20.0, 5.0, (1.0, 0.0))
+    _run(chain, stats, 3)
+    chain.forcing = None
+    _run(chain, stats, 200)
+    assert stats.n_energy_resets == 2
+    assert stats.max_drift < 1e-6
+    assert np.isfinite(stats.snapshot()['energy']['drift'])
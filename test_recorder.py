@@ -0,0 +1,60 @@
+"""
+Tests that recordings keep their write buffer within budget and replay parameter changes
+from the frame they were made at.
+"""
+
+import numpy as np
+
+import recorder
+from physics import Chain
+from ensemble import Ensemble
+from playback import Playback
+from recorder import TrajectoryRecorder, TrajectoryReader
+
+
+def test_buffer_and_chunks_are_capped_by_bytes(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(recorder, 'CHUNK_BYTES', 1 << 20)
+    ensemble = Ensemble.from_chain(Chain([0.1, 0.9], [1.0, 1.0], [200.0, 100.0]), 10_000)
+    rec = TrajectoryRecorder.from_chain(str(tmp_path / 'rec'), ensemble, buffer_bytes=1 << 20)
+    row_bytes = 8 * rec.width
+    assert rec._buffer.nbytes <= 1 << 20
+    assert rec.chunk_frames == (1 << 20) // row_bytes
+    for _ in range(3 * rec.chunk_frames + 1):
+        rec.record_chain(ensemble)
+    rec.close()
+
+    reader = TrajectoryReader(str(tmp_path / 'rec'))
+    assert len(reader) == 3 * rec.chunk_frames + 1
+    assert np.array_equal(reader.slice(len(reader) - 1, len(reader))[1][0], ensemble.angles)
+    # the per-system arrays stay out of the header
+    assert 'masses' not in reader.meta
+    assert np.array_equal(reader.params_at(0)['masses'], ensemble.masses)
+
+
+def test_parameter_changes_apply_from_their_frame(tmp_path):
+
+    chain = Chain([0.1, 0.9], [1.0, 1.0], [200.0, 100.0])
+    path = str(tmp_path / 'rec')
+    with TrajectoryRecorder.from_chain(path, chain, buffer_frames=4, params={'pivot': [400.0, 100.0]}) as rec:
+        for step in range(20):
+            if step == 5:
+                chain.masses[:] = (3.0, 4.0)
+                rec.set_params(masses=chain.masses, pivot=(410.0, 100.0))
+            # unchanged values are not recorded again
+            rec.set_params(masses=chain.masses, lengths=chain.lengths)
+            chain.step(1e-3)
+            rec.record_chain(chain)
+
+    reader = TrajectoryReader(path)
+    assert reader.param_frames.tolist() == [0, 5]
+    assert reader.params_at(4)['masses'].tolist() == [1.0, 1.0]
+    assert reader.params_at(5)['masses'].tolist() == [3.0, 4.0]
+    assert reader.params_at(19)['pivot'].tolist() == [410.0, 100.0]
+    assert reader.params_at(19)['lengths'].tolist() == [200.0, 100.0]
+
+    playback = Playback(path)
+    playback.seek(reader.slice(2, 3)[0][0])
+    assert playback.params()['pivot'].tolist() == [400.0, 100.0]
+    playback.seek(playback.t_end)
+    assert playback.params()['pivot'].tolist() == [410.0, 100.0]
@@ -0,0 +1,211 @@
+"""
+A module containing the frame encoding pipeline behind offline video export.
+
+Frames are rendered by the caller as fast as it can and submitted as raw RGB bytes to a
+FramePipeline, which hands them through a bounded queue to writer threads. When the writers
+fall behind, submit() blocks, so memory stays at queue_frames frames however long the video
+is, and no frame is ever dropped. Only encoding leaves the caller's thread: rendering and
+the physics behind each frame stay with the caller, so they set the pace once the writers
+keep up.
+
+Two writers are provided:
+
+    FFmpegWriter       pipes raw RGB frames into a local ffmpeg binary, which encodes on
+                       its own threads. Frames must arrive in order, so it uses one thread.
+    PNGSequenceWriter  writes frame_000000.png, ... with chaosmap.write_png. zlib releases
+                       the GIL while compressing, so several writer threads encode in parallel.
+
+Classes:
+    FFmpegWriter:
+        Represents an ffmpeg process encoding raw frames to a video file.
+
+        Methods:
+            __init__(path: str, size: tuple, fps: float, crf: int=18, ffmpeg: str='ffmpeg') -> None:
+                Initializes a new FFmpegWriter object and starts ffmpeg.
+            write(index: int, frame: bytes) -> None:
+                Encodes one frame.
+            close() -> None:
+                Finishes the video.
+
+    PNGSequenceWriter:
+        Represents a directory of numbered PNG frames.
+
+        Methods:
+            __init__(path: str, size: tuple, fps: float, level: int=1) -> None:
+                Initializes a new PNGSequenceWriter object.
+            write(index: int, frame: bytes) -> None:
+                Writes one frame.
+            close() -> None:
+                Does nothing, every frame is complete once written.
+
+    FramePipeline:
+        Represents a bounded queue of frames feeding writer threads.
+
+        Methods:
+            __init__(writer, queue_frames: int=8, workers: int=None) -> None:
+                Initializes a new FramePipeline object and starts its threads.
+            submit(frame: bytes) -> None:
+                Queues the next frame, blocking while the queue is full.
+            close() -> None:
+                Waits for every queued frame to be written and closes the writer.
+
+Functions:
+    open_writer(path: str, size: tuple, fps: float) -> object:
+        Returns an FFmpegWriter for video file names and a PNGSequenceWriter otherwise.
+"""
+
+import os
+import queue
+import shutil
+import threading
+import subprocess
+import numpy as np
+
+from chaosmap import write_png
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.webm', '.avi')
+
+
+class FFmpegWriter:
+    """
+    Represents an ffmpeg process encoding raw frames to a video file.
+
+    Attributes:
+        path (str): The output file.
+        size (tuple): The (width, height) of every frame.
+        fps (float): The frame rate.
+        ordered (bool): Always True, frames must be written in order.
+    """
+
+    ordered = True
+
+    def __init__(self, path: str, size: tuple, fps: float, crf: int=18, ffmpeg: str='ffmpeg') -> None:
+
+        binary = shutil.which(ffmpeg)
+        if binary is None:
+            raise FileNotFoundError(f"'{ffmpeg}' was not found, export a PNG sequence instead")
+
+        self.path = path
+        self.size = tuple(size)
+        self.fps = fps
+        command = [binary, '-loglevel', 'error', '-y',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{size[0]}x{size[1]}", '-r', str(fps),
+                   '-i', '-', '-c:v', 'libx264', '-preset', 'medium', '-crf', str(crf),
+                   '-pix_fmt', 'yuv420p', path]
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, index: int, frame: bytes) -> None:
+
+        self._process.stdin.write(frame)
+
+    def close(self) -> None:
+
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {self._process.returncode}")
+
+
+class PNGSequenceWriter:
+    """
+    Represents a directory of numbered PNG frames.
+
+    Attributes:
+        path (str): The output directory.
+        size (tuple): The (width, height) of every frame.
+        fps (float): The frame rate, recorded in fps.txt for whoever assembles the video.
+        level (int): The zlib compression level, low by default since speed matters more here.
+        ordered (bool): Always False, frames can be written by several threads at once.
+    """
+
+    ordered = False
+
+    def __init__(self, path: str, size: tuple, fps: float, level: int=1) -> None:
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.size = tuple(size)
+        self.fps = fps
+        self.level = level
+        with open(os.path.join(path, 'fps.txt'), 'w') as file:
+            file.write(f"{fps}\n")
+
+    def write(self, index: int, frame: bytes) -> None:
+
+        rgb = np.frombuffer(frame, dtype=np.uint8).reshape(self.size[1], self.size[0], 3)
+        write_png(os.path.join(self.path, f"frame_{index:06d}.png"), rgb, self.level)
+
+    def close(self) -> None:
+
+        pass
+
+
+def open_writer(path: str, size: tuple, fps: float):
+    """Returns an FFmpegWriter if path ends in a video extension, otherwise a PNGSequenceWriter for the directory path."""
+
+    if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+        return FFmpegWriter(path, size, fps)
+    return PNGSequenceWriter(path, size, fps)
+
+
+class FramePipeline:
+    """
+    Represents a bounded queue of frames feeding writer threads.
+
+    Attributes:
+        writer: An FFmpegWriter, PNGSequenceWriter or any object with write(index, frame),
+            close() and an ordered flag.
+        n_submitted (int): The number of frames submitted.
+    """
+
+    def __init__(self, writer, queue_frames: int=8, workers: int=None) -> None:
+
+        self.writer = writer
+        self.n_submitted = 0
+        if writer.ordered:
+            workers = 1
+        elif workers is None:
+            workers = os.cpu_count() or 1
+
+        self._queue = queue.Queue(maxsize=queue_frames)
+        self._error = None
+        self._threads = [threading.Thread(target=self._run, name=f'frame-writer-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self) -> None:
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is None:
+                try:
+                    self.writer.write(*item)
+                except Exception as error:
+                    self._error = error
+
+    def submit(self, frame: bytes) -> None:
+
+        if self._error is not None:
+            raise self._error
+        self._queue.put((self.n_submitted, frame))
+        self.n_submitted += 1
+
+    def close(self) -> None:
+
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.writer.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> "FramePipeline":
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.close()